@@ -5,13 +5,21 @@
 # This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
 
 import math,random
-
-def random_vector(minmax):
-  return [random.uniform(minmax[k][0],minmax[k][1]) for k in xrange(len(minmax))]
-
-def initialize_weights(num_weights):
-  minmax = [[-random.random(),random.random()] for _ in xrange(num_weights)]
-  return random_vector(minmax)
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from random_streams import make_rng,numpy_rng
+from reporting import Reporter
+from checkpoint import make_checkpoint,pack_floats
+from dataset import Dataset
+
+def random_vector(minmax,rng=random):
+  return [rng.uniform(minmax[k][0],minmax[k][1]) for k in xrange(len(minmax))]
+
+def initialize_weights(num_weights,rng=random):
+  minmax = [[-rng.random(),rng.random()] for _ in xrange(num_weights)]
+  return random_vector(minmax,rng)
 
 def activate(weights,vector):
   sum = weights[-1] * 1.0
@@ -65,9 +73,22 @@ def update_weights(network,lrate,mom=0.8):
         neuron['last_delta'][j] = delta
         neuron['deriv'][j] = 0.0
 
-def train_network(network,domain,num_inputs,iterations,lrate):
-  correct = 0
-  for epoch in xrange(iterations):
+def network_state(network):
+  return [[(pack_floats(n['weights']),pack_floats(n['last_delta'])) for n in layer] for layer in network]
+
+def restore_network(network,state):
+  for layer,saved in zip(network,state):
+    for neuron,(weights,last_delta) in zip(layer,saved):
+      neuron['weights'],neuron['last_delta'] = list(weights),list(last_delta)
+
+def train_network(network,domain,num_inputs,iterations,lrate,reporter=None,checkpoint=None):
+  reporter = reporter or Reporter()
+  checkpoint = make_checkpoint(checkpoint,('backpropagation.train_network',{'num_inputs':num_inputs,
+    'layers':[len(layer) for layer in network],'patterns':len(domain),'lrate':lrate}))
+  state = checkpoint and checkpoint.load()
+  if state: restore_network(network,state['network'])
+  correct = state['correct'] if state else 0
+  for epoch in xrange(state['epoch']+1 if state else 0,iterations):
     for pattern in domain:
       vector,expected = [float(pattern[k]) for k in range(num_inputs)],pattern[-1]
       output = forward_propagate(network,vector)
@@ -76,30 +97,134 @@ def train_network(network,domain,num_inputs,iterations,lrate):
       calculate_error_derivatives_for_weights(network,vector)
     update_weights(network,lrate)
     if (epoch+1)%100 == 0:
-      print "> epoch={0}, Correct={1}/{2}".format(epoch+1,correct,100*len(domain))
+      reporter.report("epoch","> epoch={epoch}, Correct={correct}/{total}",epoch=epoch+1,correct=correct,total=100*len(domain))
       correct = 0
+    if checkpoint and checkpoint.due(epoch):
+      checkpoint.save({'epoch':epoch,'correct':correct,'network':network_state(network)})
 
-def test_network(network,domain,num_inputs):
+def test_network(network,domain,num_inputs,reporter=None):
+  reporter = reporter or Reporter()
   correct = 0
   for pattern in domain:
     input_vector = [float(pattern[k]) for k in xrange(num_inputs)]
     output = forward_propagate(network,input_vector)
     if round(output)==pattern[-1]: correct += 1 
-  print "Finished test with a score of {0}/{1}".format(correct,len(domain))
+  reporter.summary("test","Finished test with a score of {correct}/{total}",correct=correct,total=len(domain))
   return correct
 
-def create_neuron(num_inputs):
-  return {'weights':initialize_weights(num_inputs+1), 
+def create_neuron(num_inputs,rng=random):
+  return {'weights':initialize_weights(num_inputs+1,rng), 
           'last_delta':[0.0]*(num_inputs+1),
           'deriv':[0.0]*(num_inputs+1)}
 
-def execute(domain,num_inputs,iterations=2000,num_hidden_nodes=4,learning_rate=0.3):
+# matrix engine: each layer holds a (neurons x inputs+1) weight matrix with the bias in the last column,
+# and the forward/backward passes run over a whole batch of patterns at once
+
+def transfer_array(activation):
+  with np.errstate(over='ignore'):
+    return 1.0 / (1.0 + np.exp(-activation))
+
+def create_matrix_layer(num_inputs,num_neurons,rng=None):
+  rng = numpy_rng(rng)
+  shape = (num_neurons,num_inputs+1)
+  weights = rng.uniform(-rng.random_sample(shape),rng.random_sample(shape))
+  return {'weights':weights,'last_delta':np.zeros(shape),'deriv':np.zeros(shape)}
+
+def create_matrix_network(num_inputs,num_hidden_nodes,num_outputs=1,rng=None):
+  rng = numpy_rng(rng)
+  return [create_matrix_layer(num_inputs,num_hidden_nodes,rng),create_matrix_layer(num_hidden_nodes,num_outputs,rng)]
+
+def forward_propagate_batch(net,inputs):
+  # returns the signal entering the network followed by the output of every layer
+  outputs = [inputs]
+  for layer in net:
+    weights = layer['weights']
+    outputs.append(transfer_array(outputs[-1].dot(weights[:,:-1].T) + weights[:,-1]))
+  return outputs
+
+def backward_propagate_error_batch(net,outputs,expected):
+  deltas = [None]*len(net)
+  error = expected - outputs[-1]
+  for index in reversed(xrange(len(net))):
+    deltas[index] = error * outputs[index+1] * (1.0 - outputs[index+1])
+    if index>0: error = deltas[index].dot(net[index]['weights'][:,:-1])
+  return deltas
+
+def calculate_error_derivatives_batch(net,outputs,deltas):
+  for i,layer in enumerate(net):
+    layer['deriv'][:,:-1] += deltas[i].T.dot(outputs[i])
+    layer['deriv'][:,-1] += deltas[i].sum(axis=0)
+
+def update_weights_batch(net,lrate,mom=0.8):
+  for layer in net:
+    delta = (lrate * layer['deriv']) + (layer['last_delta'] * mom)
+    layer['weights'] += delta
+    layer['last_delta'] = delta
+    layer['deriv'].fill(0.0)
+
+def count_correct(outputs,expected):
+  return int(np.sum(np.all(np.round(outputs)==expected,axis=1)))
+
+def train_matrix_network(network,dataset,iterations,lrate,batch_size=None,rng=None,reporter=None,checkpoint=None):
+  # batch_size=None accumulates over the whole dataset per epoch like train_network,
+  # smaller batches are drawn in a new shuffled order every epoch
+  rng = numpy_rng(rng)
+  reporter = reporter or Reporter()
+  batch_size = batch_size or len(dataset)
+  checkpoint = make_checkpoint(checkpoint,('backpropagation.train_matrix_network',{'num_inputs':dataset.num_inputs,
+    'layers':[len(layer['weights']) for layer in network],'patterns':len(dataset),'lrate':lrate,'batch_size':batch_size}))
+  state = checkpoint and checkpoint.load(rng)
+  if state:
+    for layer,(weights,last_delta) in zip(network,state['network']):
+      layer['weights'],layer['last_delta'] = weights,last_delta
+  dataset.order = state['order'] if state else None
+  correct = state['correct'] if state else 0
+  for epoch in xrange(state['epoch']+1 if state else 0,iterations):
+    if batch_size<len(dataset): dataset.shuffle(rng)
+    for vectors,targets in dataset.batches(batch_size):
+      outputs = forward_propagate_batch(network,vectors)
+      correct += count_correct(outputs[-1],targets)
+      deltas = backward_propagate_error_batch(network,outputs,targets)
+      calculate_error_derivatives_batch(network,outputs,deltas)
+      update_weights_batch(network,lrate)
+    if (epoch+1)%100 == 0:
+      reporter.report("epoch","> epoch={epoch}, Correct={correct}/{total}",epoch=epoch+1,correct=correct,total=100*len(dataset))
+      correct = 0
+    if checkpoint and checkpoint.due(epoch):
+      checkpoint.save({'epoch':epoch,'correct':correct,'order':dataset.order,
+        'network':[(layer['weights'],layer['last_delta']) for layer in network]},rng)
+
+def test_matrix_network(network,dataset,reporter=None,chunk_size=1000):
+  reporter = reporter or Reporter()
+  correct = 0
+  for vectors,targets in dataset.batches(chunk_size,shuffled=False):
+    correct += count_correct(forward_propagate_batch(network,vectors)[-1],targets)
+  reporter.summary("test","Finished test with a score of {correct}/{total}",correct=correct,total=len(dataset))
+  return correct
+
+def execute_matrix(domain,num_inputs,iterations,num_hidden_nodes,learning_rate,num_outputs=1,batch_size=None,rng=None,reporter=None,checkpoint=None):
+  if np is None: raise ImportError('the matrix engine requires numpy')
+  rng = numpy_rng(rng)
+  reporter = reporter or Reporter()
+  dataset = Dataset.from_domain(domain,num_inputs,num_outputs)
+  network = create_matrix_network(num_inputs,num_hidden_nodes,num_outputs,rng)
+  reporter.summary("topology","Topology: {inputs} {layers}",inputs=num_inputs,layers=' '.join([str(len(layer['weights'])) for layer in network]))
+  train_matrix_network(network,dataset,iterations,learning_rate,batch_size,rng,reporter,checkpoint)
+  test_matrix_network(network,dataset,reporter)
+  return network
+
+def execute(domain,num_inputs,iterations=2000,num_hidden_nodes=4,learning_rate=0.3,engine='dict',num_outputs=1,batch_size=None,rng=None,reporter=None,checkpoint=None):
+  # domain is a list of patterns or a dataset.Dataset, which the dict engine reads row by row
+  rng = make_rng(rng)
+  reporter = reporter or Reporter()
+  if engine=='matrix':
+    return execute_matrix(domain,num_inputs,iterations,num_hidden_nodes,learning_rate,num_outputs,batch_size,rng,reporter,checkpoint)
   network = []
-  network.append([create_neuron(num_inputs) for _ in range(num_hidden_nodes)])
-  network.append([create_neuron(len(network[-1]))])
-  print "Topology: {0} {1}".format(num_inputs,' '.join([str(len(network[i])) for i in xrange(len(network))]))
-  train_network(network,domain,num_inputs,iterations,learning_rate)  
-  test_network(network,domain,num_inputs)
+  network.append([create_neuron(num_inputs,rng) for _ in range(num_hidden_nodes)])
+  network.append([create_neuron(len(network[-1]),rng)])
+  reporter.summary("topology","Topology: {inputs} {layers}",inputs=num_inputs,layers=' '.join([str(len(network[i])) for i in xrange(len(network))]))
+  train_network(network,domain,num_inputs,iterations,learning_rate,reporter,checkpoint)  
+  test_network(network,domain,num_inputs,reporter)
   return network
 
 if __name__ == '__main__':
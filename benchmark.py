@@ -0,0 +1,204 @@
+# Benchmark Harness for the algorithms in the Python Programming Language
+
+# Runs each algorithm's search/execute entry point over a range of problem sizes, silently and in one
+# fresh process per run, and writes one JSON record per run: wall time, evaluations/sec, time-to-target
+# and peak memory. Records from two commits can be compared with --compare.
+#   python benchmark.py --output before.jsonl
+#   python benchmark.py --output after.jsonl
+#   python benchmark.py --compare before.jsonl after.jsonl
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+import sys,os,json,time,random,resource,platform,subprocess,multiprocessing,argparse
+from contextlib import contextmanager
+
+import genetic_algorithm,compact_ga,grammatical_evolution,gene_expression_programming
+import backpropagation,perceptron,som
+from reporting import SILENT
+
+@contextmanager
+def count_calls(module,name):
+  # replaces module.name with a counting wrapper, the search loops look it up as a global on every call
+  original,counter = getattr(module,name),[0]
+  def wrapper(*args,**kwargs):
+    counter[0] += 1
+    return original(*args,**kwargs)
+  setattr(module,name,wrapper)
+  try:
+    yield counter
+  finally:
+    setattr(module,name,original)
+
+def random_domain(rows,num_inputs,rng,num_outputs=1):
+  # linearly separable problem: the class is whether the inputs sum past half their range
+  domain = []
+  for _ in xrange(rows):
+    inputs = [rng.random() for _ in xrange(num_inputs)]
+    label = 1 if sum(inputs)>num_inputs/2.0 else 0
+    domain.append(inputs + ([label] if num_outputs==1 else [label,1-label]))
+  return domain
+
+# each runner returns (evaluations or None, reached target)
+
+def run_ga(size,rng,packed=False):
+  name = "fitness_packed" if packed else "fitness"
+  with count_calls(genetic_algorithm,name) as calls:
+    best = genetic_algorithm.search(50,size,100,0.98,1.0/size,packed=packed,rng=rng,reporter=SILENT)
+  return calls[0],best["fitness"]==size
+
+def run_ga_packed(size,rng):
+  return run_ga(size,rng,packed=True)
+
+def run_ga_array(size,rng):
+  best = genetic_algorithm.search(50,size,100,0.98,1.0/size,vectorized=True,rng=rng,reporter=SILENT)
+  return None,best["fitness"]==size
+
+def run_ga_islands(size,rng):
+  # evaluations happen in the island processes where count_calls cannot see them
+  best = genetic_algorithm.island_search(50,size,100,0.98,1.0/size,packed=True,rng=rng,reporter=SILENT)
+  return None,best["fitness"]==size
+
+def run_cga(size,rng):
+  with count_calls(compact_ga,"onemax") as calls:
+    best = compact_ga.search(size,500,40,rng=rng,reporter=SILENT)
+  return calls[0],best["cost"]==size
+
+def run_cga_array(size,rng):
+  best = compact_ga.search(size,500,40,vectorized=True,rng=rng,reporter=SILENT)
+  return None,best["cost"]==size
+
+GE_GRAMMAR = {'S':'EXP', 'EXP':[' EXP BINARY EXP ', ' (EXP BINARY EXP) ', ' VAR '],
+  'BINARY':['+', '-', '/', '*' ], 'VAR':['INPUT', '1.0']}
+
+def run_ge(size,rng,simplified=False):
+  with count_calls(grammatical_evolution,"cost") as calls:
+    best = grammatical_evolution.search(20,size,4,40,0.30,GE_GRAMMAR,7,[1,10],rng=rng,reporter=SILENT,simplified=simplified)
+  return calls[0],best['fitness']<1e-5
+
+def run_ge_simplified(size,rng):
+  return run_ge(size,rng,simplified=True)
+
+def run_gep(size,rng):
+  grammar = {"FUNC":["+","-","*","/"], "TERM":["x"]}
+  with count_calls(gene_expression_programming,"cost") as calls:
+    best = gene_expression_programming.search(grammar,[1.0,10.0],20,21,50,size,0.85,rng=rng,reporter=SILENT)
+  return calls[0],best['fitness']<1e-5
+
+def run_gep_vectorized(size,rng):
+  grammar = {"FUNC":["+","-","*","/"], "TERM":["x"]}
+  best = gene_expression_programming.search(grammar,[1.0,10.0],20,21,50,size,0.85,rng=rng,reporter=SILENT,vectorized=True)
+  return None,best['fitness']<1e-5
+
+def run_backprop(size,rng,engine='dict'):
+  domain = random_domain(size,4,rng)
+  backpropagation.execute(domain,4,iterations=50,engine=engine,rng=rng,reporter=SILENT)
+  return size*50,None
+
+def run_backprop_matrix(size,rng):
+  return run_backprop(size,rng,engine='matrix')
+
+def run_perceptron(size,rng):
+  domain = random_domain(size,4,rng)
+  perceptron.execute(domain,4,20,0.1,rng=rng,reporter=SILENT)
+  return size*20,None
+
+def run_perceptron_matrix(size,rng):
+  domain = random_domain(size,4,rng)
+  perceptron.execute(domain,4,20,0.1,rng=rng,reporter=SILENT,engine='matrix')
+  return size*20,None
+
+def run_som(size,rng,engine='dict'):
+  som.execute([[0.0,1.0]]*4,[[0.3,0.6]]*4,iterations=200,width=size,height=size,engine=engine,rng=rng,reporter=SILENT)
+  return 200,None
+
+def run_som_array(size,rng):
+  return run_som(size,rng,engine='array')
+
+CASES = [
+  # name, size parameter, sizes, quick sizes, runner
+  ('genetic_algorithm','num_bits',[64,256,1024],[64],run_ga),
+  ('genetic_algorithm_packed','num_bits',[64,1024,10000],[64],run_ga_packed),
+  ('genetic_algorithm_array','num_bits',[64,1024,10000],[64],run_ga_array),
+  ('genetic_algorithm_islands','num_bits',[64,1024,10000],[64],run_ga_islands),
+  ('compact_ga','num_bits',[64,256,1024],[64],run_cga),
+  ('compact_ga_array','num_bits',[64,1024,100000],[64],run_cga_array),
+  ('grammatical_evolution','pop_size',[50,100,200],[50],run_ge),
+  ('grammatical_evolution_simplified','pop_size',[50,100,200],[50],run_ge_simplified),
+  ('gene_expression_programming','pop_size',[40,80,160],[40],run_gep),
+  ('gene_expression_programming_vectorized','pop_size',[40,80,160,1000],[40],run_gep_vectorized),
+  ('backpropagation','rows',[100,1000],[100],run_backprop),
+  ('backpropagation_matrix','rows',[100,1000,100000],[100],run_backprop_matrix),
+  ('perceptron','rows',[100,1000,10000],[100],run_perceptron),
+  ('perceptron_matrix','rows',[100,10000,1000000],[100],run_perceptron_matrix),
+  ('som','width',[5,10,20],[5],run_som),
+  ('som_array','width',[5,10,20,100],[5],run_som_array),
+]
+
+def measure(runner,size,seed,results):
+  # runs in a fresh process so peak memory belongs to this run alone
+  sys.stdout = open(os.devnull,'w')
+  rng = random.Random(seed)
+  baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  start = time.time()
+  evaluations,reached = runner(size,rng)
+  elapsed = time.time()-start
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  results.put({'seconds':elapsed, 'evaluations':evaluations, 'reached_target':reached,
+    'peak_rss_kb':peak, 'run_rss_kb':peak-baseline})
+
+def run_case(runner,size,seed):
+  results = multiprocessing.Queue()
+  process = multiprocessing.Process(target=measure,args=(runner,size,seed,results))
+  process.start()
+  record = results.get()
+  process.join()
+  if record['evaluations']:
+    record['evaluations_per_sec'] = record['evaluations']/record['seconds'] if record['seconds']>0 else None
+  record['time_to_target'] = record['seconds'] if record['reached_target'] else None
+  return record
+
+def git_revision():
+  try:
+    return subprocess.check_output(['git','rev-parse','--short','HEAD'],stderr=open(os.devnull,'w')).strip()
+  except (OSError,subprocess.CalledProcessError):
+    return None
+
+def benchmark(output,only=None,quick=False,repeats=1,seed=1):
+  revision,python = git_revision(),platform.python_version()
+  for name,parameter,sizes,quick_sizes,runner in CASES:
+    if only and name not in only: continue
+    for size in (quick_sizes if quick else sizes):
+      for repeat in xrange(repeats):
+        record = run_case(runner,size,seed+repeat)
+        record.update({'case':name, parameter:size, 'size':size, 'repeat':repeat, 'seed':seed+repeat,
+          'revision':revision, 'python':python, 'timestamp':time.time()})
+        output.write(json.dumps(record,sort_keys=True)+"\n")
+        output.flush()
+        sys.stderr.write("{0} {1}={2}: {3:.3f}s\n".format(name,parameter,size,record['seconds']))
+
+def load(path):
+  runs = {}
+  for line in open(path):
+    record = json.loads(line)
+    runs.setdefault((record['case'],record['size']),[]).append(record['seconds'])
+  return dict((key,min(times)) for key,times in runs.items())
+
+def compare(before_path,after_path):
+  before,after = load(before_path),load(after_path)
+  print "{0:<30} {1:>8} {2:>10} {3:>10} {4:>8}".format('case','size','before','after','speedup')
+  for key in sorted(set(before)&set(after)):
+    print "{0:<30} {1:>8} {2:>10.3f} {3:>10.3f} {4:>7.2f}x".format(key[0],key[1],before[key],after[key],before[key]/max(after[key],1e-9))
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='benchmark the algorithms over a range of problem sizes')
+  parser.add_argument('--output',help='file for the JSON records, one per line (default stdout)')
+  parser.add_argument('--only',nargs='+',help='case names to run')
+  parser.add_argument('--quick',action='store_true',help='smallest size of every case only')
+  parser.add_argument('--repeat',type=int,default=1,help='runs per size, each with the next seed')
+  parser.add_argument('--seed',type=int,default=1)
+  parser.add_argument('--compare',nargs=2,metavar=('BEFORE','AFTER'),help='compare two result files')
+  args = parser.parse_args()
+  if args.compare:
+    compare(*args.compare)
+  else:
+    output = open(args.output,'w') if args.output else sys.stdout
+    benchmark(output,args.only,args.quick,args.repeat,args.seed)
@@ -0,0 +1,93 @@
+# Checkpoint and Resume for the algorithms in the Python Programming Language
+
+# A search or training loop given checkpoint=path (or a Checkpoint) saves its state every few steps and,
+# when the file already exists, restores it and continues from the step after the saved one. Resuming
+# is calling the same function again with the same arguments and checkpoint:
+#   best = search(..., rng=1, checkpoint=Checkpoint('run.ckpt',every=10))
+# The state is pickled in binary form with the RNG state, bitstrings are packed into ints and weight
+# vectors stored as raw float arrays. Each save goes to a temporary file in the same directory that is
+# then renamed over the previous checkpoint, so a run killed mid-write leaves the last checkpoint intact.
+# Each loop names itself and its sizes and parameters when it opens the checkpoint; that identity is saved
+# with the state and a file saved by a different function or with different arguments is refused. The
+# number of generations or epochs is not part of it, so a finished run can be resumed to run for longer.
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+import os,time,array,tempfile
+try:
+  import cPickle as pickle
+except ImportError:
+  import pickle
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+class Checkpoint(object):
+  def __init__(self,path,every=1,seconds=None):
+    # saves every `every` steps, or when `seconds` is given, at the first step after that much time
+    self.path, self.every, self.seconds = path, every, seconds
+    self.saved = time.time()
+    self.run = None
+
+  def due(self,step):
+    if self.seconds is not None: return time.time()-self.saved >= self.seconds
+    return self.every and (step+1) % self.every == 0
+
+  def save(self,state,rng=None):
+    if rng is not None: state['rng'] = rng_state(rng)
+    if self.run is not None: state['run'] = self.run
+    handle,temp = tempfile.mkstemp(prefix='.checkpoint-',dir=os.path.dirname(os.path.abspath(self.path)))
+    try:
+      with os.fdopen(handle,'wb') as f:
+        pickle.dump(state,f,pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+      os.rename(temp,self.path)
+    except:
+      os.remove(temp)
+      raise
+    self.saved = time.time()
+
+  def load(self,rng=None):
+    # the saved state, or None when there is nothing to resume from
+    if not os.path.exists(self.path): return None
+    with open(self.path,'rb') as f:
+      state = pickle.load(f)
+    if state.get('run')!=self.run:
+      raise ValueError("'%s' was saved by %r, not by %r" % (self.path,state.get('run'),self.run))
+    if rng is not None and 'rng' in state: restore_rng(rng,state['rng'])
+    return state
+
+def make_checkpoint(checkpoint=None,run=None):
+  # run is the (function name, {argument:value}) identity of the loop using the checkpoint
+  if checkpoint is None: return None
+  if not isinstance(checkpoint,Checkpoint): checkpoint = Checkpoint(checkpoint)
+  checkpoint.run = run
+  return checkpoint
+
+def rng_state(rng):
+  if np is not None and isinstance(rng,np.random.RandomState): return rng.get_state()
+  return rng.getstate()
+
+def restore_rng(rng,state):
+  if np is not None and isinstance(rng,np.random.RandomState):
+    rng.set_state(state)
+  else:
+    rng.setstate(state)
+
+def pack_bits(bitstring):
+  return len(bitstring),(int(bitstring,2) if bitstring else 0)
+
+def unpack_bits(packed):
+  length,value = packed
+  return "{0:0{1}b}".format(value,length) if length else ''
+
+def pack_population(pop,key,fields):
+  # keeps only the given fields of each candidate, with the key bitstring packed
+  return [dict((f,pack_bits(c[f]) if f==key else c[f]) for f in fields) for c in pop]
+
+def unpack_population(pop,key):
+  return [dict(c,**{key:unpack_bits(c[key])}) for c in pop]
+
+def pack_floats(vector):
+  return array.array('d',vector)
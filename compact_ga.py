@@ -5,15 +5,22 @@
 # This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
 
 import random
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from random_streams import make_rng,numpy_rng
+from reporting import Reporter
+from checkpoint import make_checkpoint,pack_bits,unpack_bits,pack_floats
 
 def onemax(vector):
   return sum(int(vector[x]) for x in xrange(len(vector)))
 
-def generate_candidate(vector):
+def generate_candidate(vector,rng=random):
   candidate = {}
   candidate["bitstring"] = [0]*len(vector)
   for index,prob in enumerate(vector):
-    candidate["bitstring"][index] = 1 if random.random()<prob else 0
+    candidate["bitstring"][index] = 1 if rng.random()<prob else 0
   candidate["cost"] = onemax(candidate["bitstring"])
   return candidate
 
@@ -25,16 +32,50 @@ def update_vector(vector,winner,loser,pop_size):
       else:
         vector[i] -= 1.0/float(pop_size)
 
-def search(num_bits=32,max_iterations=200,pop_size=20):
+def search_array(num_bits=32,max_iterations=200,pop_size=20,num_candidates=2,rng=None,reporter=None,checkpoint=None):
+  # probability vector as a float array, candidates sampled as boolean rows, tournament of num_candidates
+  if np is None: raise ImportError('the array version requires numpy')
+  rng = numpy_rng(rng)
+  reporter = reporter or Reporter()
+  checkpoint = make_checkpoint(checkpoint,('compact_ga.search_array',{'num_bits':num_bits,'pop_size':pop_size,
+    'num_candidates':num_candidates}))
+  state = checkpoint and checkpoint.load(rng)
+  best = state['best'] if state else {"cost":0}
+  vector = state['vector'] if state else np.full(num_bits,0.5)
+  step = 1.0/float(pop_size)
+  for iter in xrange(state['iter']+1 if state else 0,max_iterations):
+    candidates = rng.random_sample((num_candidates,num_bits)) < vector
+    costs = candidates.sum(axis=1)
+    winner,loser = candidates[np.argmax(costs)],candidates[np.argmin(costs)]
+    if costs.max() > best["cost"]: best = {"bitstring":winner.astype(np.uint8),"cost":int(costs.max())}
+    vector += step * (winner.astype(np.int8) - loser) # +step where only the winner has a 1, -step where only the loser does
+    reporter.report("iteration",">iter={iter}, f={cost}",iter=iter,cost=best["cost"])
+    if checkpoint and checkpoint.due(iter): checkpoint.save({'iter':iter,'vector':vector,'best':best},rng)
+    if best["cost"] == num_bits: break
+  return best
+
+def search(num_bits=32,max_iterations=200,pop_size=20,vectorized=False,num_candidates=2,rng=None,reporter=None,checkpoint=None):
+  rng = make_rng(rng)
+  reporter = reporter or Reporter()
+  if vectorized: return search_array(num_bits,max_iterations,pop_size,num_candidates,rng,reporter,checkpoint)
+  checkpoint = make_checkpoint(checkpoint,('compact_ga.search',{'num_bits':num_bits,'pop_size':pop_size}))
+  state = checkpoint and checkpoint.load(rng)
   best = {"cost":0}
   vector = [0.5]*num_bits
-  for iter in xrange(max_iterations):
-    c1 = generate_candidate(vector)
-    c2 = generate_candidate(vector)
+  if state:
+    vector,best = list(state['vector']),{"cost":state['cost']}
+    if state['cost']>0: best["bitstring"] = map(int,unpack_bits(state['bitstring']))
+  for iter in xrange(state['iter']+1 if state else 0,max_iterations):
+    c1 = generate_candidate(vector,rng)
+    c2 = generate_candidate(vector,rng)
     winner,loser = [c1,c2] if c1["cost"] > c2["cost"] else [c2,c1]
     if winner["cost"] > best["cost"]:best = winner 
     update_vector(vector,winner,loser,pop_size)
-    print ">iter=%d, f=%d, s=%s" % (iter,best["cost"],''.join(map(str,best["bitstring"])))
+    reporter.report("iteration",">iter={iter}, f={cost}, s={bitstring}",iter=iter,cost=best["cost"],
+      bitstring=lambda: ''.join(map(str,best["bitstring"])))
+    if checkpoint and checkpoint.due(iter):
+      checkpoint.save({'iter':iter,'vector':pack_floats(vector),'cost':best["cost"],
+        'bitstring':pack_bits(''.join(map(str,best.get("bitstring",[]))))},rng)
     if best["cost"] == num_bits: break 
   return best
 
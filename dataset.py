@@ -0,0 +1,93 @@
+# Training Datasets for the neural algorithms in the Python Programming Language
+
+# A Dataset wraps one (patterns x columns) float array, inputs first and the expected outputs after them,
+# either in memory or memory-mapped from disk. The matrix engines draw batches from it, in the stored
+# order or a shuffled one, so only one batch at a time is gathered into memory; the list engines iterate
+# over it as rows, converted to lists a chunk at a time.
+#   Dataset.from_domain(domain,num_inputs)                    an in-memory list of lists, converted once
+#   from_csv('train.csv',8,output='train.npy')                CSV converted once to a memory-mapped .npy
+#   load('train.npy',8)                                       a .npy or raw float file, memory-mapped
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+class Dataset(object):
+  def __init__(self,data,num_inputs,num_outputs=1):
+    if np is None: raise ImportError('datasets require numpy')
+    self.data, self.num_inputs, self.num_outputs = data, num_inputs, num_outputs
+    self.order = None # the current shuffled order of the patterns, None while unshuffled
+
+  @classmethod
+  def from_domain(cls,domain,num_inputs,num_outputs=1):
+    if isinstance(domain,cls): return domain
+    return cls(np.ascontiguousarray(domain,dtype=float),num_inputs,num_outputs)
+
+  def __len__(self):
+    return len(self.data)
+
+  def __iter__(self):
+    return self.rows()
+
+  def rows(self,chunk_size=1000):
+    for start in xrange(0,len(self.data),chunk_size):
+      for row in self.data[start:start+chunk_size].tolist(): yield row
+
+  def columns(self,block):
+    block = np.asarray(block,dtype=float)
+    return block[:,:self.num_inputs],block[:,self.num_inputs:self.num_inputs+self.num_outputs]
+
+  def shuffle(self,rng):
+    # each shuffle permutes the previous order, so batches(...) matches permuting the data itself
+    order = rng.permutation(len(self.data))
+    self.order = order if self.order is None else self.order[order]
+
+  def batches(self,batch_size=None,shuffled=True):
+    # (inputs,outputs) arrays of up to batch_size patterns, in the shuffled order unless shuffled=False
+    batch_size = batch_size or len(self.data)
+    for start in xrange(0,len(self.data),batch_size):
+      if self.order is None or not shuffled:
+        yield self.columns(self.data[start:start+batch_size])
+      else:
+        yield self.columns(self.data[self.order[start:start+batch_size]])
+
+def from_csv(path,num_inputs,num_outputs=1,delimiter=',',skip_header=0,output=None,chunk_size=10000):
+  # one pass to count the rows, then chunk_size lines at a time parsed into a preallocated float array,
+  # or into a .npy file at output that is memory-mapped afterwards
+  if np is None: raise ImportError('datasets require numpy')
+  rows, first = 0, None
+  with open(path) as f:
+    for i,line in enumerate(f):
+      if i<skip_header or not line.strip(): continue
+      if first is None: first = line
+      rows += 1
+  columns = len(first.split(delimiter)) if first else num_inputs+num_outputs
+  shape = (rows,columns)
+  data = np.empty(shape) if output is None else np.lib.format.open_memmap(output,mode='w+',dtype=float,shape=shape)
+  position, chunk = 0, []
+  with open(path) as f:
+    for i,line in enumerate(f):
+      if i<skip_header or not line.strip(): continue
+      chunk.append(line)
+      if len(chunk)==chunk_size:
+        data[position:position+len(chunk)] = np.loadtxt(chunk,delimiter=delimiter,ndmin=2)
+        position, chunk = position+len(chunk), []
+  if chunk: data[position:position+len(chunk)] = np.loadtxt(chunk,delimiter=delimiter,ndmin=2)
+  if output is None: return Dataset(data,num_inputs,num_outputs)
+  data.flush()
+  del data
+  return load(output,num_inputs,num_outputs)
+
+def load(path,num_inputs,num_outputs=1,columns=None,dtype=float):
+  # a .npy file, or a raw file of native floats with `columns` values per pattern, memory-mapped read-only
+  if np is None: raise ImportError('datasets require numpy')
+  if path.endswith('.npy'):
+    data = np.load(path,mmap_mode='r')
+  else:
+    data = np.memmap(path,dtype=dtype,mode='r').reshape(-1,columns or num_inputs+num_outputs)
+  return Dataset(data,num_inputs,num_outputs)
+
+def save(dataset,path):
+  np.save(path,dataset.data)
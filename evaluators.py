@@ -0,0 +1,56 @@
+# Fitness Evaluators for the evolutionary algorithms in the Python Programming Language
+
+# Pluggable strategies for scoring a population. Each evaluator exposes map(function,items),
+# returning [function(item) for item in items] in order. The function and items must be picklable
+# (module level functions, functools.partial objects, strings, numbers, lists) for the pool version.
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+import math,random,multiprocessing
+from random_streams import make_rng
+
+class Rejected(float):
+  # a racing evaluation that stopped early returns its lower bound as Rejected, which compares and sorts
+  # as that float but must not be cached as the candidate's fitness
+  __slots__ = ()
+
+class SerialEvaluator(object):
+  # evaluates in the calling process, the default used by every search
+  def map(self,function,items):
+    return [function(item) for item in items]
+
+  def close(self):
+    pass
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self,*exc_info):
+    self.close()
+
+def evaluate_chunk(task):
+  # runs in a worker: re-seed the worker's global random from the task so results do not depend on scheduling
+  function,seed,chunk = task
+  random.seed(seed)
+  return [function(item) for item in chunk]
+
+class PoolEvaluator(SerialEvaluator):
+  # evaluates chunks of the population on a multiprocessing pool, each chunk with its own derived seed
+  def __init__(self,processes=None,chunk_size=None,seed=None,rng=None):
+    self.processes = processes or multiprocessing.cpu_count()
+    self.chunk_size = chunk_size
+    self.seed = make_rng(rng).getrandbits(32) if seed is None else seed
+    self.calls = 0
+    self.pool = multiprocessing.Pool(self.processes)
+
+  def chunks(self,items):
+    size = self.chunk_size or int(math.ceil(len(items)/float(self.processes*4))) or 1
+    return [items[i:i+size] for i in xrange(0,len(items),size)]
+
+  def map(self,function,items):
+    tasks = [(function,hash((self.seed,self.calls,i)),chunk) for i,chunk in enumerate(self.chunks(list(items)))]
+    self.calls += 1
+    return [result for chunk in self.pool.map(evaluate_chunk,tasks) for result in chunk]
+
+  def close(self):
+    self.pool.close()
+    self.pool.join()
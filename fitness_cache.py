@@ -0,0 +1,44 @@
+# Fitness Cache for the program evolving algorithms in the Python Programming Language
+
+# Memoizes the fitness of evolved programs keyed on their phenotype (the program string), so
+# duplicate programs produced by crossover and the many-to-one genotype mapping are not re-evaluated.
+# Only valid when every program is scored against the same sample set.
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+from collections import OrderedDict
+
+class FitnessCache(object):
+  # bounded least-recently-used cache with hit/miss/eviction counters
+  def __init__(self,max_size=10000):
+    self.max_size = max_size
+    self.entries = OrderedDict()
+    self.hits, self.misses, self.evictions = 0, 0, 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def get(self,key):
+    try:
+      value = self.entries.pop(key)
+    except KeyError:
+      self.misses += 1
+      return None
+    self.entries[key] = value # re-insert as most recently used
+    self.hits += 1
+    return value
+
+  def put(self,key,value):
+    if key in self.entries:
+      del self.entries[key]
+    elif len(self.entries) >= self.max_size:
+      self.entries.popitem(last=False)
+      self.evictions += 1
+    self.entries[key] = value
+
+  def clear(self):
+    self.entries.clear()
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions,
+            'size':len(self.entries), 'hit_rate':(float(self.hits)/lookups if lookups else 0.0)}
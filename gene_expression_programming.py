@@ -1,121 +1,255 @@
-# Genetic Algorithm in the Python Programming Language
-
-# Based on: The Clever Algorithms Project: http://www.CleverAlgorithms.com
-# (c) Copyright 2012 Mark Chenoweth. 
-# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
-
-import math,random,operator
-
-def binary_tournament(pop):
-  i,j = random.sample(xrange(len(pop)),2)
-  return pop[i] if pop[i]['fitness'] < pop[j]['fitness'] else pop[j]
-
-def point_mutation(grammar,genome,head_length):
-  rate = 1.0/float(len(genome))
-  child = ''
-  for i in xrange(len(genome)):
-    bit = genome[i]
-    if random.random() < rate:
-      if i < head_length:
-        selection = grammar['FUNC'] if (random.random() < 0.5) else grammar['TERM']
-        bit = selection[random.randint(0,len(selection)-1)]
-      else:
-        bit = grammar['TERM'][random.randint(0,len(grammar['TERM'])-1)]
-    child += bit
-  return child
-
-def crossover(parent1,parent2,p_crossover):
-  if random.random()<p_crossover: return parent1 
-  return ''.join([parent1[i] if (random.random()<0.5) else parent2[i] for i in xrange(len(parent1))])
-
-def reproduce(grammar,selected,pop_size,p_crossover,head_length):
-  children = []
-  for i,p1 in enumerate(selected):
-    p2 = selected[i+1] if (i%2==0) else selected[i-1]
-    if i==len(selected)-1: p2 = selected[0] 
-    child = {}
-    child['genome'] = crossover(p1['genome'],p2['genome'],p_crossover)
-    child['genome'] = point_mutation(grammar,child['genome'],head_length)
-    children.append(child)
-  return children
-
-def random_genome(grammar,head_length,tail_length):
-  s = ''
-  for _ in xrange(head_length):
-    selection = grammar['FUNC'] if (random.random() < 0.5) else grammar['TERM']
-    s += selection[random.randint(0,len(selection)-1)]
-  s += ''.join([grammar['TERM'][random.randint(0,len(grammar['TERM'])-1)] for _ in range(tail_length)])
-  return s
-
-def cost(program,bounds,num_trials=30):
-  errors = 0.0
-  for _ in range(num_trials):
-    x = random.uniform(bounds[0],bounds[1])
-    expression,score = program.replace("x", str(x)),0.0
-    try:
-      score = eval(expression) 
-    except:
-      score = float('Nan')
-    if math.isnan(score) or math.isinf(score): return 1E38
-    target = x**4.0 + x**3.0 + x**2.0 + x
-    errors += abs(score-target)
-  return errors / float(num_trials)
-
-def mapping(genome,grammar):
-  off,queue,root = 0,[],{}
-  root['node'] = genome[off]
-  off+=1
-  queue.append(root)
-  while not len(queue)==0:
-    current = queue.pop(0)
-    if grammar['FUNC'].count(current['node'])>0:
-      current['left'] = {}
-      current['left']['node'] = genome[off]
-      off+=1 
-      queue.append(current['left'])
-      current['right'] = {}
-      current['right']['node'] = genome[off]
-      off+=1
-      queue.append(current['right'])
-  return root
-
-def tree_to_string(exp):
-  if (not('left' in exp)) or (not('right' in exp)): return exp['node']
-  left = tree_to_string(exp['left'])
-  right = tree_to_string(exp['right'])
-  return "({0} {1} {2})".format(left,exp['node'],right)
-
-def evaluate(candidate,grammar,bounds):
-  candidate['expression'] = mapping(candidate['genome'],grammar)
-  candidate['program'] = tree_to_string(candidate['expression'])
-  candidate['fitness'] = cost(candidate['program'],bounds)
-
-def search(grammar,bounds,h_length,t_length,max_gens,pop_size,p_cross):
-  pop = [{'genome':random_genome(grammar,h_length,t_length)} for _ in xrange(pop_size)]
-  for c in pop: evaluate(c,grammar,bounds)  
-  best = sorted(pop,key=operator.itemgetter("fitness"))[0] # [0] = minimize, [-1] = maximize
-  for gen in xrange(max_gens):
-    selected = [binary_tournament(pop) for i in xrange(pop_size)] 
-    children = reproduce(grammar,selected,pop_size,p_cross,h_length)    
-    for c in children: evaluate(c,grammar,bounds)
-    children = sorted(children,key=operator.itemgetter("fitness"))
-    if children[0]["fitness"] <= best["fitness"]: best=children[0] # [0] = minimize, [-1] = maximize
-    pop = children+pop
-    pop = pop[:pop_size]
-    print " > gen={0}, f={1}, g={2} p={3}".format(gen,best['fitness'],best['genome'],best['program'])
-    if best['fitness'] < 1e-5: break
-  return best
-
-if __name__ == '__main__':
-  # problem configuration
-  grammar = {"FUNC":["+","-","*","/"], "TERM":["x"]}
-  bounds = [1.0, 10.0]
-  # algorithm configuration
-  h_length = 20
-  t_length = 21
-  max_gens = 250
-  pop_size = 80
-  p_cross = 0.85
-  # execute the algorithm
-  best = search(grammar,bounds,h_length,t_length,max_gens,pop_size,p_cross)
-  print "done! Solution: f={0}, program={1}".format(best['fitness'],best['program'])
+# Genetic Algorithm in the Python Programming Language
+
+# Based on: The Clever Algorithms Project: http://www.CleverAlgorithms.com
+# (c) Copyright 2012 Mark Chenoweth. 
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+import math,random,operator,functools
+from collections import OrderedDict
+from evaluators import SerialEvaluator,Rejected
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from random_streams import make_rng
+from instrumentation import make_monitor,NULL_MONITOR
+from reporting import Reporter
+from checkpoint import make_checkpoint
+from simplify import canonical,compile_simplified
+
+def binary_tournament(pop,rng=random):
+  i,j = rng.sample(xrange(len(pop)),2)
+  return pop[i] if pop[i]['fitness'] < pop[j]['fitness'] else pop[j]
+
+def point_mutation(grammar,genome,head_length,rng=random):
+  rate = 1.0/float(len(genome))
+  child = ''
+  for i in xrange(len(genome)):
+    bit = genome[i]
+    if rng.random() < rate:
+      if i < head_length:
+        selection = grammar['FUNC'] if (rng.random() < 0.5) else grammar['TERM']
+        bit = selection[rng.randint(0,len(selection)-1)]
+      else:
+        bit = grammar['TERM'][rng.randint(0,len(grammar['TERM'])-1)]
+    child += bit
+  return child
+
+def crossover(parent1,parent2,p_crossover,rng=random):
+  if rng.random()<p_crossover: return parent1 
+  return ''.join([parent1[i] if (rng.random()<0.5) else parent2[i] for i in xrange(len(parent1))])
+
+def reproduce(grammar,selected,pop_size,p_crossover,head_length,rng=random):
+  children = []
+  for i,p1 in enumerate(selected):
+    p2 = selected[i+1] if (i%2==0) else selected[i-1]
+    if i==len(selected)-1: p2 = selected[0] 
+    child = {}
+    child['genome'] = crossover(p1['genome'],p2['genome'],p_crossover,rng)
+    child['genome'] = point_mutation(grammar,child['genome'],head_length,rng)
+    children.append(child)
+  return children
+
+def random_genome(grammar,head_length,tail_length,rng=random):
+  s = ''
+  for _ in xrange(head_length):
+    selection = grammar['FUNC'] if (rng.random() < 0.5) else grammar['TERM']
+    s += selection[rng.randint(0,len(selection)-1)]
+  s += ''.join([grammar['TERM'][rng.randint(0,len(grammar['TERM'])-1)] for _ in range(tail_length)])
+  return s
+
+def compile_program(program,simplified=False):
+  if simplified: return compile_simplified(program)
+  return eval('lambda x: '+program)
+
+def cost(program,bounds,num_trials=30,samples=None,rng=random,threshold=None,simplified=False):
+  # with a threshold, gives up once the error so far puts the mean above it and returns that bound as Rejected
+  function = compile_program(program,simplified)
+  if samples is not None: num_trials = len(samples)
+  limit = None if threshold is None else threshold*num_trials
+  errors = 0.0
+  for i in range(num_trials):
+    x = rng.uniform(bounds[0],bounds[1]) if samples is None else samples[i]
+    try:
+      score = function(x)
+    except (ZeroDivisionError,OverflowError):
+      score = float('Nan')
+    if math.isnan(score) or math.isinf(score): return 1E38
+    target = x**4.0 + x**3.0 + x**2.0 + x
+    errors += abs(score-target)
+    if limit is not None and errors>limit: return Rejected(errors / float(num_trials))
+  return errors / float(num_trials)
+
+def mapping(genome,grammar):
+  off,queue,root = 0,[],{}
+  root['node'] = genome[off]
+  off+=1
+  queue.append(root)
+  while not len(queue)==0:
+    current = queue.pop(0)
+    if grammar['FUNC'].count(current['node'])>0:
+      current['left'] = {}
+      current['left']['node'] = genome[off]
+      off+=1 
+      queue.append(current['left'])
+      current['right'] = {}
+      current['right']['node'] = genome[off]
+      off+=1
+      queue.append(current['right'])
+  return root
+
+def tree_to_string(exp):
+  if (not('left' in exp)) or (not('right' in exp)): return exp['node']
+  left = tree_to_string(exp['left'])
+  right = tree_to_string(exp['right'])
+  return "({0} {1} {2})".format(left,exp['node'],right)
+
+def evaluate_population(pop,grammar,bounds,num_trials=30,samples=None,cache=None,evaluator=None,rng=random,monitor=NULL_MONITOR,threshold=None,simplified=False):
+  # maps every candidate here, then scores the uncached programs through the evaluator, each distinct one
+  # only once when a cache is in use; without given samples one set is drawn here from rng for the whole
+  # call, so workers need no random state.
+  # A threshold races the evaluations, candidates that cannot get below it are marked rejected; search
+  # passes none because every child survives into the next population whatever its fitness.
+  # simplified keys the cache and the deduplication on each program's canonical form and scores that
+  if samples is None: samples = [rng.uniform(bounds[0],bounds[1]) for _ in xrange(num_trials)]
+  key = operator.itemgetter('canonical' if simplified else 'program')
+  pending = []
+  for c in pop:
+    c['expression'] = mapping(c['genome'],grammar)
+    c['program'] = tree_to_string(c['expression'])
+    if simplified: c['canonical'] = canonical(c['program'])
+    c['fitness'] = None if cache is None else cache.get(key(c))
+    if c['fitness'] is None: pending.append(c)
+  monitor.lap('mapping')
+  function = functools.partial(cost,bounds=bounds,num_trials=num_trials,samples=samples,threshold=threshold,simplified=simplified)
+  programs = [key(c) for c in pending]
+  if cache is not None: programs = list(OrderedDict.fromkeys(programs))
+  scores = dict(zip(programs,(evaluator or SerialEvaluator()).map(function,programs)))
+  for c in pending:
+    c['fitness'] = scores[key(c)]
+    if isinstance(c['fitness'],Rejected): c['rejected'] = True
+  if cache is not None:
+    for program in programs:
+      if not isinstance(scores[program],Rejected): cache.put(program,scores[program])
+  monitor.count(len(programs))
+  monitor.lap('evaluation')
+
+# population engine: every genome becomes a row of opcodes, the index of its symbol in FUNC+TERM. In Karva
+# notation the operands of node i start at position 1 + the summed arity of the nodes before it, so they
+# always sit further right and one pass from the last position to the first evaluates every program over
+# every sample at once, a (population x samples) array per position.
+
+def decode_population(pop,grammar):
+  # returns the opcodes, the position of each node's first operand and which nodes the program uses
+  symbols = grammar['FUNC']+grammar['TERM']
+  table = np.zeros(256,dtype=np.intp)
+  for code,symbol in enumerate(symbols): table[ord(symbol)] = code
+  genomes = ''.join(c['genome'] for c in pop)
+  codes = table[np.frombuffer(genomes,dtype=np.uint8)].reshape(len(pop),-1)
+  arity = np.where(codes<len(grammar['FUNC']),2,0)
+  first = 1 + np.cumsum(arity,axis=1) - arity
+  coding = np.logical_and.accumulate(np.arange(codes.shape[1])<first,axis=1)
+  return codes,np.minimum(first,codes.shape[1]-2),coding
+
+def cost_population(codes,first,coding,grammar,samples):
+  # fitness vector as cost would compute it per program, a division by zero anywhere in a program
+  # (where python raises ZeroDivisionError) or a non-finite result costs 1E38
+  functions = {'+':np.add,'-':np.subtract,'*':np.multiply,'/':np.true_divide}
+  samples = np.asarray(samples,dtype=float)
+  num_funcs,(size,length) = len(grammar['FUNC']),codes.shape
+  values = np.empty((length,size,len(samples)))
+  invalid = np.zeros(size,dtype=bool)
+  with np.errstate(all='ignore'):
+    for i in reversed(xrange(length)):
+      # only nodes a program uses are computed, the operands of those are always used too
+      ops,used = codes[:,i],coding[:,i]
+      for code,symbol in enumerate(grammar['TERM']):
+        values[i,used & (ops==num_funcs+code)] = samples if symbol=='x' else float(symbol)
+      for code,symbol in enumerate(grammar['FUNC']):
+        nodes = np.flatnonzero(used & (ops==code))
+        if not len(nodes): continue
+        left,right = values[first[nodes,i],nodes],values[first[nodes,i]+1,nodes]
+        values[i,nodes] = functions[symbol](left,right)
+        if symbol=='/': invalid[nodes] |= (right==0).any(axis=1)
+    targets = samples**4.0 + samples**3.0 + samples**2.0 + samples
+    scores = np.abs(values[0]-targets).sum(axis=1) / float(len(samples))
+  scores[invalid | ~np.isfinite(values[0]).all(axis=1)] = 1E38
+  return scores
+
+def evaluate_population_array(pop,grammar,bounds,num_trials=30,samples=None,rng=random,monitor=NULL_MONITOR):
+  # scores every candidate, leaving out the expression and program, see express
+  if np is None: raise ImportError('the population engine requires numpy')
+  if samples is None: samples = [rng.uniform(bounds[0],bounds[1]) for _ in xrange(num_trials)]
+  codes,first,coding = decode_population(pop,grammar)
+  monitor.lap('mapping')
+  for c,fitness in zip(pop,cost_population(codes,first,coding,grammar,samples).tolist()):
+    c['fitness'] = fitness
+  monitor.count(len(pop))
+  monitor.lap('evaluation')
+
+def express(candidate,grammar):
+  # fills in the expression tree and program of a candidate scored by the population engine
+  if 'program' not in candidate:
+    candidate['expression'] = mapping(candidate['genome'],grammar)
+    candidate['program'] = tree_to_string(candidate['expression'])
+  return candidate['program']
+
+def search(grammar,bounds,h_length,t_length,max_gens,pop_size,p_cross,num_trials=30,cache=None,evaluator=None,rng=None,observer=None,reporter=None,checkpoint=None,vectorized=False,simplified=False):
+  # vectorized scores each generation with the population engine, which neither caches nor uses evaluator;
+  # otherwise simplified evaluates the simplify form of each program, so programs that differ only in
+  # redundancy share one evaluation and one cache entry
+  rng = make_rng(rng)
+  reporter = reporter or Reporter()
+  checkpoint = make_checkpoint(checkpoint,('gene_expression_programming.search',{'grammar':grammar,'bounds':bounds,
+    'h_length':h_length,'t_length':t_length,'pop_size':pop_size,'p_cross':p_cross,'num_trials':num_trials,'vectorized':vectorized}))
+  monitor = make_monitor(observer)
+  def evaluate(candidates):
+    if vectorized:
+      evaluate_population_array(candidates,grammar,bounds,num_trials,samples,rng,monitor)
+    else:
+      evaluate_population(candidates,grammar,bounds,num_trials,samples,cache,evaluator,rng,monitor,None,simplified)
+  state = checkpoint and checkpoint.load(rng)
+  if state:
+    samples,pop,best = state['samples'],state['pop'],state['best']
+  else:
+    # a cache needs one fixed sample set for the whole run so cached fitness values stay comparable
+    samples = None
+    if cache is not None: samples = [rng.uniform(bounds[0],bounds[1]) for _ in xrange(num_trials)]
+    pop = [{'genome':random_genome(grammar,h_length,t_length,rng)} for _ in xrange(pop_size)]
+    monitor.lap('initialization')
+    evaluate(pop)
+    best = min(pop,key=operator.itemgetter("fitness")) # min = minimize, max = maximize
+  for gen in xrange(state['gen']+1 if state else 0,max_gens):
+    selected = [binary_tournament(pop,rng) for i in xrange(pop_size)] 
+    monitor.lap('selection')
+    children = reproduce(grammar,selected,pop_size,p_cross,h_length,rng)    
+    monitor.lap('reproduction')
+    evaluate(children)
+    fittest = min(children,key=operator.itemgetter("fitness"))
+    if fittest["fitness"] <= best["fitness"]: best=fittest # <= minimize, >= maximize
+    # every child replaces a parent, so the population needs no ordering
+    pop = (children+pop)[:pop_size]
+    monitor.lap('replacement')
+    reporter.report('generation'," > gen={gen}, f={fitness}, g={genome} p={program}",gen=gen,fitness=best['fitness'],genome=best['genome'],program=lambda: express(best,grammar))
+    monitor.lap('reporting')
+    if checkpoint and checkpoint.due(gen):
+      checkpoint.save({'gen':gen,'samples':samples,'pop':pop,'best':best},rng)
+      monitor.lap('checkpoint')
+    monitor.generation(gen,pop,best,'genome' if vectorized else 'program',cache)
+    if best['fitness'] < 1e-5: break
+  express(best,grammar)
+  return best
+
+if __name__ == '__main__':
+  # problem configuration
+  grammar = {"FUNC":["+","-","*","/"], "TERM":["x"]}
+  bounds = [1.0, 10.0]
+  # algorithm configuration
+  h_length = 20
+  t_length = 21
+  max_gens = 250
+  pop_size = 80
+  p_cross = 0.85
+  # execute the algorithm
+  best = search(grammar,bounds,h_length,t_length,max_gens,pop_size,p_cross)
+  print "done! Solution: f={0}, program={1}".format(best['fitness'],best['program'])
@@ -4,49 +4,285 @@
 # (c) Copyright 2012 Mark Chenoweth. 
 # This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
 
-import random,operator
+import math,random,operator,multiprocessing
+from evaluators import SerialEvaluator
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from random_streams import make_rng,spawn,numpy_rng
+from instrumentation import make_monitor,NULL_MONITOR
+from reporting import Reporter
+from checkpoint import make_checkpoint,pack_population,unpack_population
 
 def fitness(bitstring): # OneMax problem. Seeking binary string of all 1's
   return sum(int(bitstring[x]) for x in xrange(len(bitstring)))
 
-def random_bitstring(num_bits):
-  return "".join(random.choice("01") for i in xrange(num_bits))	
+def random_bitstring(num_bits,rng=random):
+  return "".join(rng.choice("01") for i in xrange(num_bits))	
 
-def binary_tournament(pop):
-  i, j = random.sample(xrange(len(pop)),2)
+def binary_tournament(pop,rng=random):
+  i, j = rng.sample(xrange(len(pop)),2)
   return pop[i] if pop[i]['fitness'] > pop[j]['fitness'] else pop[j] # < = minimize, > = maximize
 
-def point_mutation(bs,rate):
-  return "".join([("0" if bs[i]=="1" else "1") if (random.random()<rate) else bs[i] for i in xrange(len(bs))])
+def point_mutation(bs,rate,rng=random):
+  return "".join([("0" if bs[i]=="1" else "1") if (rng.random()<rate) else bs[i] for i in xrange(len(bs))])
   
-def crossover(parent1,parent2,p_crossover):
-  if random.random()>=p_crossover: return parent1 
-  point = random.randint(1,len(parent1)-1)
+def crossover(parent1,parent2,p_crossover,rng=random):
+  if rng.random()>=p_crossover: return parent1 
+  point = rng.randint(1,len(parent1)-1)
   return parent1[:point]+parent2[point:]
 
-def reproduce(selected,p_crossover,p_mutation):
+def reproduce(selected,p_crossover,p_mutation,rng=random):
   children = [] 
   for i in xrange(len(selected)-1):
     child = {}
-    child["bitstring"] = crossover(selected[i]["bitstring"],selected[i+1]["bitstring"],p_crossover)
-    child["bitstring"] = point_mutation(child["bitstring"],p_mutation)
+    child["bitstring"] = crossover(selected[i]["bitstring"],selected[i+1]["bitstring"],p_crossover,rng)
+    child["bitstring"] = point_mutation(child["bitstring"],p_mutation,rng)
     children.append(child)
   return children
   
-def search(max_gens,num_bits,pop_size,p_crossover,p_mutation):
-  pop = [{'bitstring':random_bitstring(num_bits)} for i in xrange(pop_size)]  
-  for c in pop: c["fitness"] = fitness(c["bitstring"])
-  best = sorted(pop,key=operator.itemgetter("fitness"))[-1] # [0] = minimize, [-1] = maximize
-  for gen in xrange(max_gens):
-    selected = [binary_tournament(pop) for i in xrange(pop_size)] 
-    children = reproduce(selected,p_crossover,p_mutation)
-    for c in children: c["fitness"] = fitness(c["bitstring"])    
-    children = sorted(children,key=operator.itemgetter("fitness"))
-    if children[-1]["fitness"] >= best["fitness"]: best=children[-1] # [0] = minimize, [-1] = maximize
+def assign_fitness(pop,key,function,evaluator,monitor=NULL_MONITOR):
+  for c,f in zip(pop,evaluator.map(function,[c[key] for c in pop])): c["fitness"] = f
+  monitor.count(len(pop))
+
+def search(max_gens,num_bits,pop_size,p_crossover,p_mutation,packed=False,evaluator=None,rng=None,observer=None,reporter=None,checkpoint=None,vectorized=False):
+  if vectorized and (evaluator is not None or observer is not None):
+    raise ValueError("the array engine scores whole populations itself and takes no evaluator or observer")
+  rng = make_rng(rng)
+  evaluator = evaluator or SerialEvaluator()
+  reporter = reporter or Reporter()
+  if vectorized: return search_array(max_gens,num_bits,pop_size,p_crossover,p_mutation,rng,reporter,checkpoint)
+  if packed: return search_packed(max_gens,num_bits,pop_size,p_crossover,p_mutation,evaluator,rng,observer,reporter,checkpoint)
+  checkpoint = make_checkpoint(checkpoint,('genetic_algorithm.search',{'num_bits':num_bits,'pop_size':pop_size,
+    'p_crossover':p_crossover,'p_mutation':p_mutation}))
+  monitor = make_monitor(observer)
+  state = checkpoint and checkpoint.load(rng)
+  if state:
+    pop,best = unpack_population(state['pop'],"bitstring"),unpack_population([state['best']],"bitstring")[0]
+  else:
+    pop = [{'bitstring':random_bitstring(num_bits,rng)} for i in xrange(pop_size)]  
+    monitor.lap("initialization")
+    assign_fitness(pop,"bitstring",fitness,evaluator,monitor)
+    monitor.lap("evaluation")
+    best = max(pop,key=operator.itemgetter("fitness")) # min = minimize, max = maximize
+  for gen in xrange(state['gen']+1 if state else 0,max_gens):
+    selected = [binary_tournament(pop,rng) for i in xrange(pop_size)] 
+    monitor.lap("selection")
+    children = reproduce(selected,p_crossover,p_mutation,rng)
+    monitor.lap("reproduction")
+    assign_fitness(children,"bitstring",fitness,evaluator,monitor)
+    monitor.lap("evaluation")
+    fittest = max(children,key=operator.itemgetter("fitness"))
+    if fittest["fitness"] >= best["fitness"]: best=fittest # <= minimize, >= maximize
     pop = children
-    print ">%d: %d, %s" % (gen,best["fitness"],best["bitstring"])
+    monitor.lap("replacement")
+    reporter.report("generation",">{gen}: {fitness}, {bitstring}",gen=gen,fitness=best["fitness"],bitstring=best["bitstring"])
+    monitor.lap("reporting")
+    if checkpoint and checkpoint.due(gen):
+      fields = ("bitstring","fitness")
+      checkpoint.save({'gen':gen,'pop':pack_population(pop,"bitstring",fields),'best':pack_population([best],"bitstring",fields)[0]},rng)
+      monitor.lap("checkpoint")
+    monitor.generation(gen,pop,best,"bitstring")
     if best["fitness"]==num_bits: break
   return best
+
+# packed representation: each genome is an arbitrary-precision int, bit num_bits-1 holds bitstring[0]
+
+def pack(bitstring):
+  return int(bitstring,2)
+
+def unpack(genome,num_bits):
+  return "{0:0{1}b}".format(genome,num_bits)
+
+def random_packed(num_bits,rng=random):
+  return rng.getrandbits(num_bits)
+
+def fitness_packed(genome): # OneMax as a popcount
+  return bin(genome).count("1")
+
+def point_mutation_packed(genome,num_bits,rate,rng=random):
+  # jump between flipped bits with geometrically distributed skips, not one draw per bit
+  if rate<=0.0: return genome
+  if rate>=1.0: return genome ^ ((1<<num_bits)-1)
+  log_q = math.log(1.0-rate)
+  mask, i = 0, int(math.log(1.0-rng.random())/log_q)
+  while i<num_bits:
+    mask |= 1<<i
+    i += 1+int(math.log(1.0-rng.random())/log_q)
+  return genome ^ mask
+
+def crossover_packed(parent1,parent2,num_bits,p_crossover,rng=random):
+  if rng.random()>=p_crossover: return parent1
+  point = rng.randint(1,num_bits-1)
+  mask = (1<<(num_bits-point))-1 # low bits taken from parent2
+  return (parent1 & ~mask) | (parent2 & mask)
+
+def reproduce_packed(selected,num_bits,p_crossover,p_mutation,rng=random):
+  children = []
+  for i in xrange(len(selected)-1):
+    child = {}
+    child["genome"] = crossover_packed(selected[i]["genome"],selected[i+1]["genome"],num_bits,p_crossover,rng)
+    child["genome"] = point_mutation_packed(child["genome"],num_bits,p_mutation,rng)
+    children.append(child)
+  return children
+
+def search_packed(max_gens,num_bits,pop_size,p_crossover,p_mutation,evaluator=None,rng=None,observer=None,reporter=None,checkpoint=None):
+  rng = make_rng(rng)
+  evaluator = evaluator or SerialEvaluator()
+  reporter = reporter or Reporter()
+  checkpoint = make_checkpoint(checkpoint,('genetic_algorithm.search_packed',{'num_bits':num_bits,'pop_size':pop_size,
+    'p_crossover':p_crossover,'p_mutation':p_mutation}))
+  monitor = make_monitor(observer)
+  state = checkpoint and checkpoint.load(rng)
+  if state:
+    pop,best = state['pop'],state['best']
+  else:
+    pop = [{'genome':random_packed(num_bits,rng)} for i in xrange(pop_size)]
+    monitor.lap("initialization")
+    assign_fitness(pop,"genome",fitness_packed,evaluator,monitor)
+    monitor.lap("evaluation")
+    best = max(pop,key=operator.itemgetter("fitness"))
+  for gen in xrange(state['gen']+1 if state else 0,max_gens):
+    selected = [binary_tournament(pop,rng) for i in xrange(pop_size)]
+    monitor.lap("selection")
+    children = reproduce_packed(selected,num_bits,p_crossover,p_mutation,rng)
+    monitor.lap("reproduction")
+    assign_fitness(children,"genome",fitness_packed,evaluator,monitor)
+    monitor.lap("evaluation")
+    fittest = max(children,key=operator.itemgetter("fitness"))
+    if fittest["fitness"] >= best["fitness"]: best=fittest
+    pop = children
+    monitor.lap("replacement")
+    reporter.report("generation",">{gen}: {fitness}",gen=gen,fitness=best["fitness"])
+    monitor.lap("reporting")
+    if checkpoint and checkpoint.due(gen):
+      checkpoint.save({'gen':gen,'pop':pop,'best':best},rng)
+      monitor.lap("checkpoint")
+    monitor.generation(gen,pop,best,"genome")
+    if best["fitness"]==num_bits: break
+  return {"bitstring":unpack(best["genome"],num_bits),"fitness":best["fitness"]}
+
+# array engine: parents and children live in two (pop_size x num_bits) uint8 buffers that swap roles every
+# generation, and selection, crossover and mutation are drawn for the whole population at once. Only the
+# population-sized matrices are reused, the index vectors and flip positions are drawn as new arrays
+
+def search_array(max_gens,num_bits,pop_size,p_crossover,p_mutation,rng=None,reporter=None,checkpoint=None):
+  if np is None: raise ImportError('the array engine requires numpy')
+  rng = numpy_rng(rng)
+  reporter = reporter or Reporter()
+  checkpoint = make_checkpoint(checkpoint,('genetic_algorithm.search_array',{'num_bits':num_bits,'pop_size':pop_size,
+    'p_crossover':p_crossover,'p_mutation':p_mutation}))
+  state = checkpoint and checkpoint.load(rng)
+  if state:
+    parents,best = state['pop'],state['best']
+  else:
+    parents = (rng.random_sample((pop_size,num_bits))<0.5).astype(np.uint8)
+  children,mates = np.empty_like(parents),np.empty_like(parents)
+  fitness,child_fitness = parents.sum(axis=1,dtype=np.int64),np.empty(pop_size,dtype=np.int64)
+  mask,columns = np.empty(parents.shape,dtype=bool),np.arange(num_bits)
+  if not state:
+    fittest = np.argmax(fitness)
+    best = {"bitstring":parents[fittest].copy(),"fitness":int(fitness[fittest])}
+  for gen in xrange(state['gen']+1 if state else 0,max_gens):
+    # binary tournaments between two distinct random members, ties go to the second as in binary_tournament
+    first = rng.randint(0,pop_size,pop_size)
+    second = (first+rng.randint(1,pop_size,pop_size)) % pop_size
+    selected = np.where(fitness[first]>fitness[second],first,second)
+    # child i is selected[i] crossed with selected[i+1] (wrapping, so the population keeps its size)
+    np.take(parents,selected,axis=0,out=children)
+    np.take(parents,np.roll(selected,-1),axis=0,out=mates)
+    points = rng.randint(1,num_bits,pop_size)
+    points[rng.random_sample(pop_size)>=p_crossover] = num_bits
+    np.greater_equal(columns,points[:,np.newaxis],out=mask)
+    np.copyto(children,mates,where=mask)
+    # a binomial count of flips at uniform positions, a position drawn twice flips once
+    flips = rng.randint(0,children.size,rng.binomial(children.size,p_mutation))
+    children.reshape(-1)[flips] ^= 1
+    children.sum(axis=1,dtype=np.int64,out=child_fitness)
+    parents,children,fitness,child_fitness = children,parents,child_fitness,fitness
+    fittest = np.argmax(fitness)
+    if fitness[fittest] >= best["fitness"]: best = {"bitstring":parents[fittest].copy(),"fitness":int(fitness[fittest])}
+    reporter.report("generation",">{gen}: {fitness}",gen=gen,fitness=best["fitness"])
+    if checkpoint and checkpoint.due(gen): checkpoint.save({'gen':gen,'pop':parents,'best':best},rng)
+    if best["fitness"]==num_bits: break
+  return {"bitstring":"".join(map(str,best["bitstring"].tolist())),"fitness":best["fitness"]}
+
+# island model: one population per process, every migration_interval generations each island sends copies
+# of its fittest num_migrants to its neighbours and replaces its weakest with the migrants it receives.
+# Each (source,destination) pair has its own queue, so only migrants cross process boundaries. An island
+# that stops sends None in place of its next migrants and a neighbour reading it stops at that migration
+# too, so every island stops at a generation fixed by the seed and a seeded run repeats exactly.
+
+def neighbours(island,num_islands,topology):
+  if topology=="ring": return [(island+1)%num_islands]
+  if topology=="full": return [i for i in xrange(num_islands) if i!=island]
+  raise ValueError("unknown topology '%s'" % topology)
+
+def migrate(pop,inboxes,outboxes,num_migrants):
+  # returns None when a neighbour has stopped instead of sending migrants
+  pop = sorted(pop,key=operator.itemgetter("fitness"),reverse=True)
+  for queue in outboxes: queue.put(pop[:num_migrants])
+  migrants = []
+  for queue in inboxes:
+    received = queue.get()
+    if received is None: return None
+    migrants.extend(received)
+  return pop[:len(pop)-len(migrants)] + migrants
+
+def evolve_island(island,config,rng,inboxes,outboxes,results):
+  max_gens,num_bits,pop_size,p_crossover,p_mutation,migration_interval,num_migrants,packed = config
+  key,function = ("genome",fitness_packed) if packed else ("bitstring",fitness)
+  create = random_packed if packed else random_bitstring
+  pop = [{key:create(num_bits,rng)} for i in xrange(pop_size)]
+  for c in pop: c["fitness"] = function(c[key])
+  best,gen = max(pop,key=operator.itemgetter("fitness")),0
+  while gen<max_gens and best["fitness"]<num_bits:
+    selected = [binary_tournament(pop,rng) for i in xrange(pop_size)]
+    if packed:
+      pop = reproduce_packed(selected,num_bits,p_crossover,p_mutation,rng)
+    else:
+      pop = reproduce(selected,p_crossover,p_mutation,rng)
+    for c in pop: c["fitness"] = function(c[key])
+    fittest = max(pop,key=operator.itemgetter("fitness"))
+    if fittest["fitness"] >= best["fitness"]: best = fittest
+    gen += 1
+    if gen % migration_interval == 0 and best["fitness"]<num_bits:
+      pop = migrate(pop,inboxes,outboxes,num_migrants)
+      if pop is None: break
+  for queue in outboxes: queue.put(None) # unread by neighbours that end at max_gens with this island
+  results.put((island,gen,best))
+  # migrants left unread by stopped neighbours must not keep this process from exiting
+  for queue in outboxes: queue.cancel_join_thread()
+
+def island_search(max_gens,num_bits,pop_size,p_crossover,p_mutation,num_islands=4,topology="ring",
+    migration_interval=10,num_migrants=2,packed=False,rng=None,reporter=None):
+  # pop_size is per island; once one island finds the optimum the others stop as the news reaches them
+  if num_islands<2: raise ValueError("the island model needs at least two islands")
+  rng = make_rng(rng)
+  reporter = reporter or Reporter()
+  sources = dict((i,[]) for i in xrange(num_islands))
+  channels = {}
+  for i in xrange(num_islands):
+    for j in neighbours(i,num_islands,topology):
+      channels[(i,j)] = multiprocessing.Queue()
+      sources[j].append(i)
+  if num_migrants*len(sources[0]) >= pop_size-1: raise ValueError("too many migrants for the population size")
+  config = (max_gens,num_bits,pop_size,p_crossover,p_mutation,migration_interval,num_migrants,packed)
+  results = multiprocessing.Queue()
+  islands = []
+  for i,stream in enumerate(spawn(rng,num_islands)):
+    inboxes = [channels[(j,i)] for j in sources[i]]
+    outboxes = [channels[(i,j)] for j in neighbours(i,num_islands,topology)]
+    islands.append(multiprocessing.Process(target=evolve_island,args=(i,config,stream,inboxes,outboxes,results)))
+  for process in islands: process.start()
+  finished = sorted([results.get() for _ in islands],key=operator.itemgetter(0))
+  for process in islands: process.join()
+  for island,gens,best in finished:
+    reporter.report("island",">island={island}: {fitness}, gens={gens}",island=island,fitness=best["fitness"],gens=gens)
+  island,gens,best = max(finished,key=lambda result: result[2]["fitness"])
+  bitstring = unpack(best["genome"],num_bits) if packed else best["bitstring"]
+  return {"bitstring":bitstring,"fitness":best["fitness"],"island":island}
   
 if __name__ == '__main__':
   num_bits = 64       # problem configuration
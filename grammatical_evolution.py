@@ -4,64 +4,69 @@
 # (c) Copyright 2012 Mark Chenoweth. 
 # This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
 
-import math,random,operator
+import math,random,operator,functools,re
+from collections import OrderedDict
+from evaluators import SerialEvaluator,Rejected
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from random_streams import make_rng,numpy_rng
+from instrumentation import make_monitor,NULL_MONITOR
+from reporting import Reporter
+from checkpoint import make_checkpoint,pack_population,unpack_population
+from simplify import canonical,compile_simplified
 
-def random_bitstring(num_bits):
-  return ''.join(random.choice(['0','1']) for i in xrange(num_bits))
+def random_bitstring(num_bits,rng=random):
+  return ''.join(rng.choice(['0','1']) for i in xrange(num_bits))
 
-def point_mutation(bitstring):
+def point_mutation(bitstring,rng=random):
   rate=1.0/float(len(bitstring))
   child = ''
   for i in xrange(len(bitstring)):
     bit = bitstring[i]
-    child += ( ('0' if bit=='1' else '1' ) if (random.random()<rate) else bit )
+    child += ( ('0' if bit=='1' else '1' ) if (rng.random()<rate) else bit )
   return child
 
-def one_point_crossover(parent1,parent2,codon_bits,p_cross):
-  if random.random()>=p_cross: return parent1 
-  cut = random.randint(0,min(len(parent1),len(parent2))/codon_bits)*codon_bits
+def one_point_crossover(parent1,parent2,codon_bits,p_cross,rng=random):
+  if rng.random()>=p_cross: return parent1 
+  cut = rng.randint(0,min(len(parent1),len(parent2))/codon_bits)*codon_bits
   return parent1[:cut]+parent2[cut:]
   
-def codon_duplication(bitstring,codon_bits):
+def codon_duplication(bitstring,codon_bits,rng=random):
   rate=1.0/float(codon_bits)
-  if random.random() >= rate: return bitstring 
+  if rng.random() >= rate: return bitstring 
   codons = len(bitstring)/codon_bits  
-  idx = random.randint(0,codons)*codon_bits
+  idx = rng.randint(0,codons)*codon_bits
   return bitstring + bitstring[idx:idx+codon_bits]
 
-def codon_deletion(bitstring,codon_bits):
+def codon_deletion(bitstring,codon_bits,rng=random):
   rate=0.5/float(codon_bits)
-  if random.random() >= rate: return bitstring 
+  if rng.random() >= rate: return bitstring 
   codons = len(bitstring)/codon_bits  
-  idx = random.randint(0,codons)*codon_bits
+  idx = rng.randint(0,codons)*codon_bits
   return bitstring[:idx] + bitstring[idx+codon_bits:]
 
-def reproduce(selected,pop_size,p_cross,codon_bits):
+def reproduce(selected,pop_size,p_cross,codon_bits,rng=random):
   children = []
   for i,p1 in enumerate(selected):
     p2 = selected[i+1] if (i%2==0) else selected[i-1]
     child = {}
-    child['bitstring'] = one_point_crossover(p1['bitstring'],p2['bitstring'],codon_bits,p_cross)
-    child['bitstring'] = codon_deletion(child['bitstring'],codon_bits)
-    child['bitstring'] = codon_duplication(child['bitstring'],codon_bits)
-    child['bitstring'] = point_mutation(child['bitstring'])
+    child['bitstring'] = one_point_crossover(p1['bitstring'],p2['bitstring'],codon_bits,p_cross,rng)
+    child['bitstring'] = codon_deletion(child['bitstring'],codon_bits,rng)
+    child['bitstring'] = codon_duplication(child['bitstring'],codon_bits,rng)
+    child['bitstring'] = point_mutation(child['bitstring'],rng)
     children.append(child)
   return children
 
-def binary_tournament(pop):
-  i, j = random.sample(xrange(len(pop)),2)
+def binary_tournament(pop,rng=random):
+  i, j = rng.sample(xrange(len(pop)),2)
   return pop[i] if pop[i]['fitness'] < pop[j]['fitness'] else pop[j]
   
 def decode_integers(bitstring,codon_bits):
-  ints = []
-  for off in xrange(len(bitstring)/codon_bits):
-    idx = off*codon_bits
-    codon = bitstring[idx:idx+codon_bits]
-    sum = 0
-    for i in xrange(len(codon)):
-      sum += (1 if codon[i]=='1' else 0) * (2 ** i);
-    ints.append(sum)
-  return ints
+  # bit i of a codon has weight 2**i, so each codon is its reversed bit string read as binary
+  end = (len(bitstring)/codon_bits)*codon_bits
+  return [int(bitstring[idx:idx+codon_bits][::-1],2) for idx in xrange(0,end,codon_bits)]
 
 def map_(grammar,integers,max_depth):
   done, offset, depth = False, 0, 0
@@ -83,44 +88,159 @@ def map_(grammar,integers,max_depth):
     depth += 1
   return symbolic_string
 
+def compile_grammar(grammar):
+  # splits every production once into (is_nonterminal,text) items so derive never searches or rebuilds strings
+  nonterminals = sorted([key for key in grammar if key!='S'],key=len,reverse=True)
+  pattern = re.compile('('+'|'.join(re.escape(key) for key in nonterminals)+')')
+  def split(production):
+    return [(item in nonterminals,item) for item in pattern.split(production) if item!='']
+  rules = dict((key,[split(p) for p in grammar[key]]) for key in nonterminals)
+  # expressions at the depth limit are replaced by a variable, as in map_
+  limit = [[(False,p)] for p in grammar['VAR']]
+  return {'start':split(grammar['S']), 'rules':rules, 'limit':limit}
+
+def derive(compiled,integers,max_depth):
+  # leftmost derivation on a stack of (item,depth), one codon per expansion, codons wrap around
+  tokens, offset, rules = [], 0, compiled['rules']
+  stack = [(item,0) for item in reversed(compiled['start'])]
+  while stack:
+    (is_nonterminal,symbol),depth = stack.pop()
+    if not is_nonterminal:
+      tokens.append(symbol)
+      continue
+    choices = compiled['limit'] if (symbol=='EXP' and depth>=max_depth-1) else rules[symbol]
+    production = choices[integers[offset] % len(choices)]
+    offset = 0 if (offset==len(integers)-1) else offset+1
+    stack.extend((item,depth+1) for item in reversed(production))
+  return ''.join(tokens)
+
 def target_function(x):
   return x**4.0 + x**3.0 + x**2.0 + x
   
-def sample_from_bounds(bounds):
-  return random.uniform(bounds[0],bounds[1])
+def sample_from_bounds(bounds,rng=random):
+  return rng.uniform(bounds[0],bounds[1])
   #return bounds[0] + ((bounds[1] - bounds[0]) * random.random())
 
-def cost(program,bounds,num_trials=30):
-  if program=='INPUT': return 9999999 
+def cost(program,bounds,num_trials=30,samples=None,rng=random,threshold=None,simplified=False):
+  # with a threshold, gives up once the error so far puts the mean above it and returns that bound as Rejected.
+  # simplified runs the program as a compiled simplify graph, given the same str(x) value the text substitution uses
+  if program=='INPUT' and not simplified: return 9999999 
+  function = compile_simplified(program) if simplified else None
+  if samples is not None: num_trials = len(samples)
+  limit = None if threshold is None else threshold*num_trials
   sum_error = 0.0    
-  for _ in xrange(num_trials):
-    x = sample_from_bounds(bounds)
-    expression = program.replace('INPUT',str(x))
+  for i in xrange(num_trials):
+    x = sample_from_bounds(bounds,rng) if samples is None else samples[i]
     try: 
-      score = eval(expression) 
+      score = eval(program.replace('INPUT',str(x))) if function is None else function(float(str(x)))
     except:
       score = float('NaN')
     if math.isnan(score) or math.isinf(score): return 9999999 
     sum_error += abs(score-target_function(x))
+    if limit is not None and sum_error>limit: return Rejected(sum_error / float(num_trials))
   return sum_error / float(num_trials)
 
-def evaluate(candidate,codon_bits,grammar,max_depth,bounds):
-  candidate['integers'] = decode_integers(candidate['bitstring'],codon_bits)
-  candidate['program'] = map_(grammar,candidate['integers'],max_depth)
-  candidate['fitness'] = cost(candidate['program'],bounds)
+def sample_batch(bounds,num_trials,rng=None):
+  if np is None: raise ImportError('batch evaluation requires numpy')
+  return numpy_rng(rng).uniform(bounds[0],bounds[1],num_trials)
+
+def cost_batch(program,samples,targets,simplified=False):
+  # evaluates the program over every sample point at once, samples is a numpy array
+  if program=='INPUT' and not simplified: return 9999999
+  with np.errstate(all='ignore'):
+    try:
+      scores = eval(program,{'INPUT':samples}) if not simplified else compile_simplified(program)(samples)
+    except (ZeroDivisionError,OverflowError):
+      return 9999999
+    errors = np.abs(scores-targets)
+  if not np.all(np.isfinite(errors)): return 9999999
+  return float(np.mean(errors))
+
+def draw_samples(bounds,num_trials,batch=False,rng=random):
+  if not batch: return [sample_from_bounds(bounds,rng) for _ in xrange(num_trials)],None
+  samples = sample_batch(bounds,num_trials,rng)
+  return samples,target_function(samples)
+
+def evaluate_population(pop,codon_bits,grammar,max_depth,bounds,num_trials=30,samples=None,targets=None,cache=None,evaluator=None,compiled=None,rng=random,monitor=NULL_MONITOR,threshold=None,simplified=False):
+  # maps every candidate here, then scores the uncached programs through the evaluator, each distinct one
+  # only once when a cache is in use; without given samples one set is drawn here from rng for the whole
+  # call, so workers need no random state.
+  # A threshold races the per-sample evaluations, candidates that cannot get below it are marked rejected.
+  # simplified keys the cache and the deduplication on each program's canonical form and scores that
+  if samples is None: samples = draw_samples(bounds,num_trials,False,rng)[0]
+  key = operator.itemgetter('canonical' if simplified else 'program')
+  pending = []
+  for c in pop:
+    c['integers'] = decode_integers(c['bitstring'],codon_bits)
+    if compiled is None:
+      c['program'] = map_(grammar,c['integers'],max_depth)
+    else:
+      c['program'] = derive(compiled,c['integers'],max_depth)
+    if simplified: c['canonical'] = canonical(c['program'])
+    c['fitness'] = None if cache is None else cache.get(key(c))
+    if c['fitness'] is None: pending.append(c)
+  monitor.lap('mapping')
+  if targets is None:
+    function = functools.partial(cost,bounds=bounds,num_trials=num_trials,samples=samples,threshold=threshold,simplified=simplified)
+  else:
+    function = functools.partial(cost_batch,samples=samples,targets=targets,simplified=simplified)
+  programs = [key(c) for c in pending]
+  if cache is not None: programs = list(OrderedDict.fromkeys(programs))
+  scores = dict(zip(programs,(evaluator or SerialEvaluator()).map(function,programs)))
+  for c in pending:
+    c['fitness'] = scores[key(c)]
+    if isinstance(c['fitness'],Rejected): c['rejected'] = True
+  if cache is not None:
+    for program in programs:
+      if not isinstance(scores[program],Rejected): cache.put(program,scores[program])
+  monitor.count(len(programs))
+  monitor.lap('evaluation')
   
-def search(max_gens,pop_size,codon_bits,num_bits,p_cross,grammar,max_depth,bounds):
-  pop = [{'bitstring':random_bitstring(num_bits)} for i in xrange(pop_size)]
-  for c in pop: evaluate(c,codon_bits,grammar,max_depth,bounds)
-  best = sorted(pop,key=operator.itemgetter('fitness'))[-1] # [0] = minimize, [-1] = maximize
-  for gen in range(max_gens):
-    selected = [binary_tournament(pop) for i in xrange(pop_size)] 
-    children = reproduce(selected,pop_size,p_cross,codon_bits)
-    for c in children: evaluate(c,codon_bits,grammar,max_depth,bounds)    
-    children = sorted(children,key=operator.itemgetter('fitness'))
-    if children[-1]['fitness'] >= best['fitness']: best = children[-1] # <= minimize, >= maximize
-    pop = sorted((children+pop),key=operator.itemgetter('fitness'))[:pop_size]
-    print ' > gen=%d, f=%f\n s=%s' % (gen,best['fitness'],best['program'].replace('and True','').replace('True and ',''))
+def search(max_gens,pop_size,codon_bits,num_bits,p_cross,grammar,max_depth,bounds,num_trials=30,batch=False,cache=None,evaluator=None,fast_map=False,rng=None,observer=None,reporter=None,checkpoint=None,racing=False,simplified=False):
+  # racing stops evaluating a child once it is certain to be worse than every member of the population,
+  # since truncation to pop_size would drop it anyway. simplified evaluates the simplify form of each
+  # program, so programs that differ only in redundancy share one evaluation and one cache entry
+  rng = make_rng(rng)
+  reporter = reporter or Reporter()
+  checkpoint = make_checkpoint(checkpoint,('grammatical_evolution.search',{'pop_size':pop_size,'codon_bits':codon_bits,
+    'num_bits':num_bits,'p_cross':p_cross,'grammar':grammar,'max_depth':max_depth,'bounds':bounds,'num_trials':num_trials,
+    'batch':batch}))
+  monitor = make_monitor(observer)
+  compiled = compile_grammar(grammar) if fast_map else None
+  state = checkpoint and checkpoint.load(rng)
+  if state:
+    samples,targets = state['samples'],state['targets']
+    pop,best = unpack_population(state['pop'],'bitstring'),unpack_population([state['best']],'bitstring')[0]
+    for c in pop+[best]: c['integers'] = decode_integers(c['bitstring'],codon_bits)
+  else:
+    # a cache needs one fixed sample set for the whole run so cached fitness values stay comparable
+    samples,targets = None,None
+    if batch or cache is not None: samples,targets = draw_samples(bounds,num_trials,batch,rng)
+    pop = [{'bitstring':random_bitstring(num_bits,rng)} for i in xrange(pop_size)]
+    monitor.lap('initialization')
+    evaluate_population(pop,codon_bits,grammar,max_depth,bounds,num_trials,samples,targets,cache,evaluator,compiled,rng,monitor,None,simplified)
+    best = max(reversed(pop),key=operator.itemgetter('fitness')) # min = minimize, max = maximize, last of equals
+  for gen in range(state['gen']+1 if state else 0,max_gens):
+    selected = [binary_tournament(pop,rng) for i in xrange(pop_size)] 
+    monitor.lap('selection')
+    children = reproduce(selected,pop_size,p_cross,codon_bits,rng)
+    monitor.lap('reproduction')
+    if batch and cache is None: samples,targets = draw_samples(bounds,num_trials,batch,rng)
+    threshold = max(c['fitness'] for c in pop) if racing else None
+    evaluate_population(children,codon_bits,grammar,max_depth,bounds,num_trials,samples,targets,cache,evaluator,compiled,rng,monitor,threshold,simplified)
+    fittest = max(reversed(children),key=operator.itemgetter('fitness'))
+    if fittest['fitness'] >= best['fitness']: best = fittest # <= minimize, >= maximize
+    pop = sorted(children+pop,key=operator.itemgetter('fitness'))[:pop_size]
+    monitor.lap('replacement')
+    reporter.report('generation',' > gen={gen}, f={fitness:f}\n s={program}',gen=gen,fitness=best['fitness'],
+      program=lambda: best['program'].replace('and True','').replace('True and ',''))
+    monitor.lap('reporting')
+    if checkpoint and checkpoint.due(gen):
+      fields = ('bitstring','program','fitness')
+      checkpoint.save({'gen':gen,'samples':samples,'targets':targets,'pop':pack_population(pop,'bitstring',fields),
+        'best':pack_population([best],'bitstring',fields)[0]},rng)
+      monitor.lap('checkpoint')
+    monitor.generation(gen,pop,best,'program',cache)
     if best['fitness']<1e-5: break 
   return best
   
@@ -0,0 +1,56 @@
+# Search Instrumentation for the evolutionary algorithms in the Python Programming Language
+
+# A search loop calls lap(phase) after each phase of a generation, count(n) after evaluating and
+# generation(...) once per generation. SearchMonitor accumulates the timings and hands a record to
+# an observer callback, NULL_MONITOR (used when no observer is given) does nothing.
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+import time,math
+
+class NullMonitor(object):
+  enabled = False
+
+  def lap(self,phase):
+    pass
+
+  def count(self,evaluations):
+    pass
+
+  def generation(self,gen,pop,best,key,cache=None):
+    pass
+
+NULL_MONITOR = NullMonitor()
+
+class SearchMonitor(NullMonitor):
+  enabled = True
+
+  def __init__(self,observer=None,clock=time.time):
+    self.observer, self.clock = observer, clock
+    self.phases, self.evaluations, self.records = {}, 0, 0
+    self.started = self.mark = clock()
+
+  def lap(self,phase):
+    # charges the time since the previous lap to phase, cumulative over the run
+    now = self.clock()
+    self.phases[phase] = self.phases.get(phase,0.0) + (now-self.mark)
+    self.mark = now
+
+  def count(self,evaluations):
+    self.evaluations += evaluations
+
+  def generation(self,gen,pop,best,key,cache=None):
+    fitnesses = [c['fitness'] for c in pop]
+    mean = sum(fitnesses)/float(len(fitnesses))
+    variance = sum((f-mean)**2.0 for f in fitnesses)/float(len(fitnesses))
+    record = {'generation':gen, 'elapsed':self.clock()-self.started, 'phases':dict(self.phases),
+      'evaluations':self.evaluations, 'best_fitness':best['fitness'], 'fitness_mean':mean,
+      'fitness_std':math.sqrt(variance), 'fitness_min':min(fitnesses), 'fitness_max':max(fitnesses),
+      'unique':len(set(c[key] for c in pop))/float(len(pop)),
+      'cache':(None if cache is None else cache.stats())}
+    self.records += 1
+    if self.observer is not None: self.observer(record)
+    self.mark = self.clock() # the observer's own time is not charged to any phase
+    return record
+
+def make_monitor(observer=None):
+  return NULL_MONITOR if observer is None else SearchMonitor(observer)
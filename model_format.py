@@ -0,0 +1,115 @@
+# Compact Model Files for the trained neural models in the Python Programming Language
+
+# A model file is the 8 byte magic 'CLEVMDL1', the length of a JSON header as a little-endian uint64, the
+# header itself (space padded so the arrays start on an 8 byte boundary) and then the weight arrays as
+# little-endian float64 in C order. The header holds the model kind, its topology and the shape of each
+# array. load memory-maps the file and returns views into it, so loading copies nothing and creates no
+# per-neuron objects; predict_batch scores a whole array (or Dataset) of input patterns at once.
+#   export_network(backpropagation.execute(...),'xor.model')    dict or matrix engine network
+#   export_weights(perceptron.execute(...),'or.model')          list or matrix engine weights
+#   export_som(som.execute(...),'som.model')                    dict or array engine map
+#   predict_batch(load('xor.model'),inputs)
+# predict_batch gives the output layer for a network (one column per output, flat for a single output),
+# the class for perceptron weights as perceptron.predict_batch does, and the best matching unit index
+# (x*height+y, as in the codebook) for a map.
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+import os,json,struct,tempfile
+try:
+  import numpy as np
+except ImportError:
+  np = None
+import backpropagation,perceptron,som
+from dataset import Dataset
+
+MAGIC = 'CLEVMDL1'
+VERSION = 1
+
+def write_model(path,header,arrays):
+  # written to a temporary file in the same directory and renamed, so a reader never sees half a model
+  if np is None: raise ImportError('model files require numpy')
+  arrays = [np.ascontiguousarray(a,dtype='<f8') for a in arrays]
+  header = dict(header,version=VERSION,shapes=[list(a.shape) for a in arrays])
+  text = json.dumps(header,sort_keys=True)
+  text += ' '*(-(len(MAGIC)+8+len(text)) % 8)
+  handle,temp = tempfile.mkstemp(prefix='.model-',dir=os.path.dirname(os.path.abspath(path)))
+  try:
+    with os.fdopen(handle,'wb') as f:
+      f.write(MAGIC)
+      f.write(struct.pack('<Q',len(text)))
+      f.write(text)
+      for a in arrays: f.write(a.tostring())
+    os.rename(temp,path)
+  except:
+    os.remove(temp)
+    raise
+
+def read_model(path):
+  # the header and its arrays as read-only views of one memory map
+  if np is None: raise ImportError('model files require numpy')
+  with open(path,'rb') as f:
+    if f.read(len(MAGIC))!=MAGIC: raise ValueError("'%s' is not a model file" % path)
+    length = struct.unpack('<Q',f.read(8))[0]
+    header = json.loads(f.read(length))
+  if header['version']!=VERSION: raise ValueError("unsupported model file version %s" % header['version'])
+  sizes = [int(np.prod(shape)) for shape in header['shapes']]
+  data = np.memmap(path,dtype='<f8',mode='r',offset=len(MAGIC)+8+length,shape=(sum(sizes),)) if sum(sizes) else np.empty(0)
+  arrays, start = [], 0
+  for shape,size in zip(header['shapes'],sizes):
+    arrays.append(data[start:start+size].reshape(shape))
+    start += size
+  return header,arrays
+
+def export_network(network,path):
+  # a backpropagation network from either engine, each layer as its (neurons x inputs+1) weight matrix
+  layers = [layer['weights'] if isinstance(layer,dict) else [neuron['weights'] for neuron in layer] for layer in network]
+  layers = [np.asarray(weights,dtype=float) for weights in layers]
+  write_model(path,{'kind':'network','num_inputs':layers[0].shape[1]-1,'layers':[len(w) for w in layers]},layers)
+
+def export_weights(weights,path):
+  # perceptron weights from either engine, as the (outputs x inputs+1) matrix of the matrix engine
+  weights = np.atleast_2d(np.asarray(weights,dtype=float))
+  write_model(path,{'kind':'perceptron','num_inputs':weights.shape[1]-1,'num_outputs':len(weights)},[weights])
+
+def export_som(map_,path):
+  # a self-organizing map from either engine, as the (units x dims) codebook in x*height+y order
+  if isinstance(map_,dict):
+    vectors,width,height = map_['vectors'],map_['width'],map_['height']
+  else:
+    vectors = [c['vector'] for c in map_]
+    width,height = max(c['coord'][0] for c in map_)+1,max(c['coord'][1] for c in map_)+1
+  vectors = np.asarray(vectors,dtype=float)
+  write_model(path,{'kind':'som','width':width,'height':height,'dims':vectors.shape[1]},[vectors])
+
+def load(path):
+  # a model dict of memory-mapped arrays: layers of {'weights'} as the backpropagation matrix engine
+  # uses, perceptron 'weights', or som 'vectors' with 'width' and 'height'
+  header,arrays = read_model(path)
+  model = dict(header)
+  if header['kind']=='network':
+    model['layers'] = [{'weights':weights} for weights in arrays]
+  elif header['kind']=='perceptron':
+    model['weights'] = arrays[0]
+  elif header['kind']=='som':
+    model['vectors'] = arrays[0]
+  else:
+    raise ValueError("unknown model kind '%s'" % header['kind'])
+  return model
+
+def predict_chunk(model,inputs):
+  if model['kind']=='network':
+    outputs = backpropagation.forward_propagate_batch(model['layers'],inputs)[-1]
+    return outputs[:,0] if outputs.shape[1]==1 else outputs
+  if model['kind']=='perceptron': return perceptron.predict_batch(model['weights'],inputs)
+  return som.get_best_matching_units(model['vectors'],inputs)
+
+def predict_batch(model,inputs,chunk_size=1000):
+  # inputs is a (patterns x inputs) array, a list of patterns or a Dataset, whose output columns are ignored;
+  # scored chunk_size patterns at a time so a memory-mapped input is never read in whole
+  if isinstance(inputs,Dataset):
+    chunks = (vectors for vectors,_ in inputs.batches(chunk_size,shuffled=False))
+  else:
+    inputs = np.atleast_2d(np.asarray(inputs,dtype=float))
+    chunks = (inputs[start:start+chunk_size] for start in xrange(0,max(len(inputs),1),chunk_size))
+  results = [predict_chunk(model,np.asarray(chunk,dtype=float)) for chunk in chunks]
+  return results[0] if len(results)==1 else np.concatenate(results)
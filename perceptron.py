@@ -5,12 +5,20 @@
 # This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
 
 import random
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from random_streams import make_rng,numpy_rng
+from reporting import Reporter
+from checkpoint import make_checkpoint,pack_floats
+from dataset import Dataset
 
-def random_vector(minmax):
-  return [random.uniform(minmax[k][0],minmax[k][1]) for k in xrange(len(minmax))]
+def random_vector(minmax,rng=random):
+  return [rng.uniform(minmax[k][0],minmax[k][1]) for k in xrange(len(minmax))]
   
-def initialize_weights(problem_size):
-  return random_vector([[-1.0,1.0] for _ in xrange(problem_size+1)])
+def initialize_weights(problem_size,rng=random):
+  return random_vector([[-1.0,1.0] for _ in xrange(problem_size+1)],rng)
 
 def update_weights(num_inputs,weights,input,out_exp,out_act,l_rate):
   for i in xrange(num_inputs):
@@ -29,8 +37,13 @@ def transfer(activation):
 def get_output(weights,vector):
   return transfer(activate(weights,vector))
 
-def train_weights(weights,domain,num_inputs,iterations,lrate):
-  for epoch in xrange(iterations):
+def train_weights(weights,domain,num_inputs,iterations,lrate,reporter=None,checkpoint=None):
+  reporter = reporter or Reporter()
+  checkpoint = make_checkpoint(checkpoint,('perceptron.train_weights',{'num_inputs':num_inputs,'patterns':len(domain),
+    'lrate':lrate}))
+  state = checkpoint and checkpoint.load()
+  if state: weights[:] = state['weights']
+  for epoch in xrange(state['epoch']+1 if state else 0,iterations):
     error = 0.0
     for pattern in domain:
       input = [float(pattern[k]) for k in xrange(num_inputs)]
@@ -38,21 +51,100 @@ def train_weights(weights,domain,num_inputs,iterations,lrate):
       expected = float(pattern[-1])
       error += abs(output-expected)
       update_weights(num_inputs,weights,input,expected,output,lrate)
-    print "> epoch={0}, error={1}".format(epoch,error)
+    reporter.report("epoch","> epoch={epoch}, error={error}",epoch=epoch,error=error)
+    if checkpoint and checkpoint.due(epoch): checkpoint.save({'epoch':epoch,'weights':pack_floats(weights)})
+    if error==0.0: break # every pattern classified correctly, further epochs would not change the weights
     
-def test_weights(weights,domain,num_inputs):
+def test_weights(weights,domain,num_inputs,reporter=None):
+  reporter = reporter or Reporter()
   correct = 0
   for pattern in domain:
     input_vector = [float(pattern[k]) for k in xrange(num_inputs)]
     output = get_output(weights,input_vector)
     if round(output)==pattern[-1]: correct += 1 
-  print "Finished test with a score of {0}/{1}".format(correct,len(domain))
+  reporter.summary("test","Finished test with a score of {correct}/{total}",correct=correct,total=len(domain))
   return correct
 
-def execute(domain,num_inputs,iterations,learning_rate):
-  weights = initialize_weights(num_inputs)
-  train_weights(weights,domain,num_inputs,iterations,learning_rate)
-  test_weights(weights,domain,num_inputs)
+# matrix engine: one weight row per output with the bias in the last column, the domain as a float matrix.
+# Two classes use a single thresholded output like the list engine, more classes one output per class with
+# the prediction being the most active output. Updates are accumulated over batches of batch_size patterns
+# drawn from a Dataset, batch_size=1 without shuffling updates after every pattern exactly as train_weights does.
+
+def initialize_weight_matrix(num_inputs,num_outputs=1,rng=None):
+  return numpy_rng(rng).uniform(-1.0,1.0,(num_outputs,num_inputs+1))
+
+def activate_batch(weights,inputs):
+  return inputs.dot(weights[:,:-1].T) + weights[:,-1]
+
+def predict_batch(weights,inputs):
+  activations = activate_batch(weights,inputs)
+  if len(weights)==1: return (activations[:,0]>=0).astype(int)
+  return np.argmax(activations,axis=1)
+
+def update_weight_matrix(weights,inputs,labels,predicted,lrate):
+  # the misclassified patterns only, pulls the right class towards each pattern and the predicted one away
+  if len(weights)==1:
+    steps = lrate * (labels-predicted)
+    weights[0,:-1] += steps.dot(inputs)
+    weights[0,-1] += steps.sum()
+  else:
+    np.add.at(weights[:,:-1],labels,lrate*inputs)
+    np.add.at(weights[:,-1],labels,lrate)
+    np.subtract.at(weights[:,:-1],predicted,lrate*inputs)
+    np.subtract.at(weights[:,-1],predicted,lrate)
+
+def train_weight_matrix(weights,dataset,iterations,lrate,batch_size=None,shuffle=False,rng=None,reporter=None,checkpoint=None):
+  # with shuffle the patterns are drawn in a new order from rng every epoch
+  rng = numpy_rng(rng) if shuffle else None
+  reporter = reporter or Reporter()
+  batch_size = batch_size or len(dataset)
+  checkpoint = make_checkpoint(checkpoint,('perceptron.train_weight_matrix',{'weights':list(weights.shape),
+    'patterns':len(dataset),'lrate':lrate,'batch_size':batch_size,'shuffle':shuffle}))
+  state = checkpoint and checkpoint.load(rng)
+  if state: weights[:] = state['weights']
+  dataset.order = state['order'] if state else None
+  for epoch in xrange(state['epoch']+1 if state else 0,iterations):
+    if shuffle: dataset.shuffle(rng)
+    errors = 0
+    for vectors,outputs in dataset.batches(batch_size):
+      targets = outputs[:,0].astype(int)
+      predicted = predict_batch(weights,vectors)
+      wrong = predicted!=targets
+      if not wrong.any(): continue
+      errors += int(wrong.sum())
+      update_weight_matrix(weights,vectors[wrong],targets[wrong],predicted[wrong],lrate)
+    reporter.report("epoch","> epoch={epoch}, error={error}",epoch=epoch,error=float(errors))
+    if checkpoint and checkpoint.due(epoch): checkpoint.save({'epoch':epoch,'weights':weights,'order':dataset.order},rng)
+    if errors==0: break
+
+def test_weight_matrix(weights,dataset,reporter=None,chunk_size=1000):
+  reporter = reporter or Reporter()
+  correct = 0
+  for vectors,outputs in dataset.batches(chunk_size,shuffled=False):
+    correct += int(np.sum(predict_batch(weights,vectors)==outputs[:,0].astype(int)))
+  reporter.summary("test","Finished test with a score of {correct}/{total}",correct=correct,total=len(dataset))
+  return correct
+
+def execute_matrix(domain,num_inputs,iterations,learning_rate,num_classes=2,batch_size=None,shuffle=False,rng=None,reporter=None,checkpoint=None):
+  # class labels are the last column, 0..num_classes-1
+  if np is None: raise ImportError('the matrix engine requires numpy')
+  rng = numpy_rng(rng)
+  reporter = reporter or Reporter()
+  dataset = Dataset.from_domain(domain,num_inputs)
+  weights = initialize_weight_matrix(num_inputs,1 if num_classes==2 else num_classes,rng)
+  train_weight_matrix(weights,dataset,iterations,learning_rate,batch_size,shuffle,rng,reporter,checkpoint)
+  test_weight_matrix(weights,dataset,reporter)
+  return weights
+
+def execute(domain,num_inputs,iterations,learning_rate,rng=None,reporter=None,checkpoint=None,engine='list',num_classes=2,batch_size=None,shuffle=False):
+  # domain is a list of patterns or a dataset.Dataset, which the list engine reads row by row
+  rng = make_rng(rng)
+  reporter = reporter or Reporter()
+  if engine=='matrix':
+    return execute_matrix(domain,num_inputs,iterations,learning_rate,num_classes,batch_size,shuffle,rng,reporter,checkpoint)
+  weights = initialize_weights(num_inputs,rng)
+  train_weights(weights,domain,num_inputs,iterations,learning_rate,reporter,checkpoint)
+  test_weights(weights,domain,num_inputs,reporter)
   return weights
 
 if __name__ == '__main__':
@@ -0,0 +1,30 @@
+# Random Number Streams for the algorithms in the Python Programming Language
+
+# Every search/execute entry point takes an rng argument: None keeps using the global random module,
+# an int seeds a private random.Random, and any object with the random.Random interface is used as is.
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+import random
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+def make_rng(rng=None):
+  if rng is None: return random
+  if isinstance(rng,(int,long)): return random.Random(rng)
+  return rng
+
+def spawn(rng,count):
+  # independent child streams seeded from the parent, one per parallel worker or job
+  rng = make_rng(rng)
+  return [random.Random(rng.getrandbits(64)) for _ in xrange(count)]
+
+def numpy_rng(rng=None):
+  # numpy stream for bulk draws, derived from rng so a seeded run is reproducible end to end;
+  # a RandomState because numpy.random.Generator needs numpy 1.17
+  rng = make_rng(rng)
+  if np is None: raise ImportError('numpy is not available')
+  if rng is random: return np.random.mtrand._rand
+  if isinstance(rng,np.random.RandomState): return rng
+  return np.random.RandomState(rng.getrandbits(32))
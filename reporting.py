@@ -0,0 +1,37 @@
+# Progress Reporting for the algorithms in the Python Programming Language
+
+# Training and search loops hand their progress to a Reporter instead of printing it directly:
+#   Reporter()                  prints every line, the default
+#   Reporter(every=100)         prints every 100th progress line
+#   Reporter(every=0)           silent (SILENT is a shared instance)
+#   Reporter(sink=records.append) passes each record as a dict instead of printing
+# Field values may be zero-argument callables (for example the join of a long bitstring), they are
+# only called when the record is actually emitted.
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+import sys
+
+class Reporter(object):
+  def __init__(self,every=1,sink=None,stream=None):
+    self.every, self.sink, self.stream = every, sink, stream
+    self.calls = 0
+
+  def emit(self,event,template,fields):
+    for key,value in fields.items():
+      if callable(value): fields[key] = value()
+    if self.sink is not None:
+      fields['event'] = event
+      self.sink(fields)
+    else:
+      print >>(self.stream or sys.stdout), template.format(**fields)
+
+  def report(self,event,template,**fields):
+    # per-iteration progress, throttled to every Nth call
+    self.calls += 1
+    if self.every and (self.calls-1) % self.every == 0: self.emit(event,template,fields)
+
+  def summary(self,event,template,**fields):
+    # one-off lines (topology, test scores), emitted unless the reporter is silent
+    if self.every: self.emit(event,template,fields)
+
+SILENT = Reporter(every=0)
@@ -0,0 +1,142 @@
+# Program Simplification for the evolved programs in the Python Programming Language
+
+# Parses a program from grammatical_evolution or gene_expression_programming (numbers, one input name
+# such as INPUT or x, + - * / with python precedence and parentheses) into a graph in which every
+# distinct subexpression is one node, built bottom up so identical subtrees are shared. While building
+# it folds constant subexpressions and applies only identities that give the same result for every
+# input, including inf, nan and errors: e+0, 0+e, e-0, e*1, 1*e, e/1 and x-x for the input itself.
+# x/x, e*0 and e-e for compound e are kept since x may be 0 and e may be inf or raise. Operands of + and
+# * are put in a fixed order (exact in floating point), which makes the canonical text of a program
+# equal for programs that differ only in redundancy or operand order:
+#   canonical(' INPUT *  (1.0 * 1.0)  +  INPUT ')      -> '(INPUT + INPUT)'
+#   compile_simplified('((x * x) + (x * x))')          -> function computing x*x once per call
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+import re,math,operator
+
+OPERATIONS = {'+':operator.add, '-':operator.sub, '*':operator.mul, '/':operator.div}
+TOKEN = re.compile(r'\d+\.\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?|\d+(?:[eE][-+]?\d+)?|[A-Za-z_]\w*|\S')
+
+class Graph(object):
+  # nodes are ('const',value), ('var',name), ('neg',a) or (op,a,b) with a,b the ids of earlier nodes
+  def __init__(self):
+    self.nodes, self.texts, self.ids = [], [], {}
+
+  def add(self,node,text):
+    if text not in self.ids:
+      self.ids[text] = len(self.nodes)
+      self.nodes.append(node)
+      self.texts.append(text)
+    return self.ids[text]
+
+  def constant(self,value):
+    return self.add(('const',value),repr(value))
+
+  def variable(self,name):
+    return self.add(('var',name),name)
+
+  def negate(self,a):
+    node = self.nodes[a]
+    if node[0]=='const': return self.constant(-node[1])
+    return self.add(('neg',a),'(-%s)' % self.texts[a])
+
+  def is_constant(self,a,value):
+    node = self.nodes[a]
+    return node[0]=='const' and node[1]==value
+
+  def binary(self,op,a,b):
+    left,right = self.nodes[a],self.nodes[b]
+    if left[0]=='const' and right[0]=='const' and not (op=='/' and right[1]==0):
+      value = OPERATIONS[op](left[1],right[1])
+      if not (isinstance(value,float) and (math.isinf(value) or math.isnan(value))): return self.constant(value)
+    if op=='+':
+      if self.is_constant(a,0): return b
+      if self.is_constant(b,0): return a
+    elif op=='-':
+      if self.is_constant(b,0): return a
+      if a==b and left[0]=='var': return self.constant(0.0)
+    elif op=='*':
+      if self.is_constant(a,1): return b
+      if self.is_constant(b,1): return a
+    elif op=='/':
+      if self.is_constant(b,1): return a
+    if op in '+*' and self.texts[b]<self.texts[a]: a,b = b,a
+    return self.add((op,a,b),'(%s %s %s)' % (self.texts[a],op,self.texts[b]))
+
+def parse(program,graph=None):
+  # returns the graph and the id of the program's root node
+  graph = graph or Graph()
+  tokens, position = TOKEN.findall(program), [0]
+  def peek():
+    return tokens[position[0]] if position[0]<len(tokens) else None
+  def take():
+    position[0] += 1
+    return tokens[position[0]-1]
+  def expression():
+    node = term()
+    while peek() in ('+','-'):
+      op = take()
+      node = graph.binary(op,node,term())
+    return node
+  def term():
+    node = factor()
+    while peek() in ('*','/'):
+      op = take()
+      node = graph.binary(op,node,factor())
+    return node
+  def factor():
+    token = take() if peek() is not None else None
+    if token=='(':
+      node = expression()
+      if take()!=')': raise ValueError("unbalanced parentheses in '%s'" % program)
+      return node
+    if token=='-': return graph.negate(factor())
+    if token=='+': return factor()
+    if token is not None and (token[0].isdigit() or token[0]=='.'):
+      return graph.constant(int(token) if token.isdigit() else float(token))
+    if token is not None and (token[0].isalpha() or token[0]=='_'): return graph.variable(token)
+    raise ValueError("unexpected '%s' in '%s'" % (token,program))
+  root = expression()
+  if position[0]!=len(tokens): raise ValueError("unexpected '%s' in '%s'" % (peek(),program))
+  return graph,root
+
+def canonical(program):
+  graph,root = parse(program)
+  return graph.texts[root]
+
+def reachable(graph,root):
+  seen, stack = set(), [root]
+  while stack:
+    node = stack.pop()
+    if node in seen: continue
+    seen.add(node)
+    stack.extend(graph.nodes[node][1:] if graph.nodes[node][0] not in ('const','var') else [])
+  return sorted(seen) # children are created before their parents, so ascending ids are a valid order
+
+def compile_simplified(program):
+  # one python function of the input evaluating each distinct subexpression once, every name is the input;
+  # subexpressions used more than once are assigned to a local, the rest are written inline
+  graph,root = parse(program)
+  order = reachable(graph,root)
+  uses = dict((i,0) for i in order)
+  for i in order:
+    if graph.nodes[i][0] not in ('const','var'):
+      for child in graph.nodes[i][1:]: uses[child] += 1
+  names, lines, namespace = {}, [], {}
+  for i in order:
+    node = graph.nodes[i]
+    if node[0]=='const':
+      names[i] = 'c%d' % i
+      namespace[names[i]] = node[1]
+    elif node[0]=='var':
+      names[i] = 'x'
+    else:
+      text = '(-%s)' % names[node[1]] if node[0]=='neg' else '(%s %s %s)' % (names[node[1]],node[0],names[node[2]])
+      if uses[i]>1:
+        names[i] = 't%d' % i
+        lines.append('  %s = %s' % (names[i],text))
+      else:
+        names[i] = text
+  if not lines: return eval('lambda x: '+names[root],namespace)
+  exec 'def program(x):\n%s\n  return %s\n' % ('\n'.join(lines),names[root]) in namespace
+  return namespace['program']
@@ -5,16 +5,23 @@
 # This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
 
 import math,random
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from random_streams import make_rng,numpy_rng
+from reporting import Reporter
+from checkpoint import make_checkpoint,pack_floats
 
-def random_vector(minmax):
-  return [random.uniform(minmax[k][0],minmax[k][1]) for k in xrange(len(minmax))]
+def random_vector(minmax,rng=random):
+  return [rng.uniform(minmax[k][0],minmax[k][1]) for k in xrange(len(minmax))]
 
-def initialize_vectors(domain,width,height):
+def initialize_vectors(domain,width,height,rng=random):
   codebook_vectors = []
   for x in xrange(width):
     for y in xrange(height):
       codebook = {}
-      codebook['vector'] = random_vector(domain)
+      codebook['vector'] = random_vector(domain,rng)
       codebook['coord'] = [x,y] 
       codebook_vectors.append(codebook)
   return codebook_vectors
@@ -45,45 +52,258 @@ def update_codebook_vector(codebook,pattern,lrate):
     error = pattern[i]-codebook['vector'][i]
     codebook['vector'][i] += lrate * error 
 
-def train_network(vectors,shape,iterations,l_rate,neighborhood_size):
-  for iter in xrange(iterations):
-    pattern = random_vector(shape)
+def train_network(vectors,shape,iterations,l_rate,neighborhood_size,rng=random,reporter=None,checkpoint=None):
+  reporter = reporter or Reporter()
+  checkpoint = make_checkpoint(checkpoint,('som.train_network',{'units':len(vectors),'shape':shape,'l_rate':l_rate,
+    'neighborhood_size':neighborhood_size}))
+  state = checkpoint and checkpoint.load(rng)
+  if state:
+    for c,vector in zip(vectors,state['vectors']): c['vector'] = list(vector)
+  for iter in xrange(state['iter']+1 if state else 0,iterations):
+    pattern = random_vector(shape,rng)
     lrate = l_rate * (1.0-(float(iter)/float(iterations)))
     neigh_size = neighborhood_size * (1.0-(float(iter)/float(iterations)))
     bmu,dist = get_best_matching_unit(vectors,pattern)
     neighbors = get_vectors_in_neighborhood(bmu,vectors,neigh_size)
     for node in neighbors:
       update_codebook_vector(node,pattern,lrate)
-    print ">training: neighbors={0}, bmu_dist={1}".format(len(neighbors),dist)
+    reporter.report("iteration",">training: neighbors={neighbors}, bmu_dist={dist}",neighbors=len(neighbors),dist=dist)
+    if checkpoint and checkpoint.due(iter):
+      checkpoint.save({'iter':iter,'vectors':[pack_floats(c['vector']) for c in vectors]},rng)
 
-def summarize_vectors(vectors):
+def summarize_vectors(vectors,reporter=None):
+  reporter = reporter or Reporter()
   minmax = [[1,0] for _ in xrange(len(vectors[0]['vector']))]
   for c in vectors:
     for i,v in enumerate(c['vector']):
       if v<minmax[i][0]: minmax[i][0] = v 
       if v>minmax[i][1]: minmax[i][1] = v 
-  s = ''
-  for i,bounds in enumerate(minmax):
-    s += "{0}={1} ".format(i,bounds)
-  print "Vector details: {0}".format(s)
+  reporter.summary("vectors","Vector details: {details}",details=lambda: describe_bounds(minmax))
   return minmax
 
-def test_network(codebook_vectors,shape,num_trials=100):
+def describe_bounds(minmax):
+  return ''.join("{0}={1} ".format(i,bounds) for i,bounds in enumerate(minmax))
+
+def test_network(codebook_vectors,shape,num_trials=100,rng=random,reporter=None):
+  reporter = reporter or Reporter()
   error = 0.0
   for _ in xrange(num_trials):
-    pattern = random_vector(shape)
+    pattern = random_vector(shape,rng)
     bmu,dist = get_best_matching_unit(codebook_vectors,pattern)
     error += dist
   error /= float(num_trials)
-  print "Finished, average error={0}".format(error) 
+  reporter.summary("test","Finished, average error={error}",error=error)
+  return error
+
+# array engine: the codebook is one (units x dims) array, unit index x*height+y as in initialize_vectors
+
+def initialize_codebook(domain,width,height,rng=None):
+  # a numpy RandomState draws the whole codebook at once, any other stream is drawn in the order
+  # initialize_vectors uses, so given the same stream both engines start from the same codebook
+  rng = make_rng(rng)
+  som = {'width':width, 'height':height}
+  if isinstance(rng,np.random.RandomState):
+    low,high = np.array([b[0] for b in domain]),np.array([b[1] for b in domain])
+    som['vectors'] = rng.uniform(low,high,(width*height,len(domain)))
+  else:
+    som['vectors'] = np.array([random_vector(domain,rng) for _ in xrange(width*height)])
+  som['coords'] = np.array([[x,y] for x in xrange(width) for y in xrange(height)])
+  som['grid'] = grid_distance_table(width,height)
+  return som
+
+def grid_distance_table(width,height):
+  # grid distance for every offset between two units, (2*width-1 x 2*height-1) instead of (units x units)
+  dx = np.arange(-(width-1),width)[:,np.newaxis]
+  dy = np.arange(-(height-1),height)[np.newaxis,:]
+  return np.sqrt(dx**2.0 + dy**2.0)
+
+def get_grid_distances(som,unit):
+  # grid distance from unit to every unit, in codebook order
+  x,y = divmod(unit,som['height'])
+  w,h = som['width'],som['height']
+  return som['grid'][w-1-x:2*w-1-x, h-1-y:2*h-1-y].ravel()
+
+def get_best_matching_unit_index(vectors,pattern):
+  dists = np.sum((vectors-pattern)**2.0,axis=1) # squared distance is enough for the argmin
+  index = int(np.argmin(dists))
+  return [index,math.sqrt(dists[index])]
+
+def train_codebook(som,shape,iterations,l_rate,neighborhood_size,rng=random,reporter=None,checkpoint=None):
+  reporter = reporter or Reporter()
+  checkpoint = make_checkpoint(checkpoint,('som.train_codebook',{'width':som['width'],'height':som['height'],'shape':shape,
+    'l_rate':l_rate,'neighborhood_size':neighborhood_size}))
+  vectors = som['vectors']
+  state = checkpoint and checkpoint.load(rng)
+  if state: vectors[:] = state['vectors']
+  for iter in xrange(state['iter']+1 if state else 0,iterations):
+    pattern = np.array(random_vector(shape,rng))
+    lrate = l_rate * (1.0-(float(iter)/float(iterations)))
+    neigh_size = neighborhood_size * (1.0-(float(iter)/float(iterations)))
+    bmu,dist = get_best_matching_unit_index(vectors,pattern)
+    neighbors = get_grid_distances(som,bmu) <= neigh_size
+    vectors[neighbors] += lrate * (pattern-vectors[neighbors])
+    reporter.report("iteration",">training: neighbors={neighbors}, bmu_dist={dist}",neighbors=np.count_nonzero(neighbors),dist=dist)
+    if checkpoint and checkpoint.due(iter): checkpoint.save({'iter':iter,'vectors':vectors},rng)
+
+def summarize_codebook(som,reporter=None):
+  reporter = reporter or Reporter()
+  vectors = som['vectors']
+  minmax = np.column_stack([np.minimum(vectors.min(axis=0),1),np.maximum(vectors.max(axis=0),0)]).tolist()
+  reporter.summary("vectors","Vector details: {details}",details=lambda: describe_bounds(minmax))
+  return minmax
+
+def test_codebook(som,shape,num_trials=100,rng=random,reporter=None):
+  reporter = reporter or Reporter()
+  error = 0.0
+  for _ in xrange(num_trials):
+    bmu,dist = get_best_matching_unit_index(som['vectors'],np.array(random_vector(shape,rng)))
+    error += dist
+  error /= float(num_trials)
+  reporter.summary("test","Finished, average error={error}",error=error)
   return error
 
-def execute(domain,shape,iterations=100,l_rate=0.3,neigh_size=5,width=4,height=5):
-  vectors = initialize_vectors(domain,width,height)
-  summarize_vectors(vectors)
-  train_network(vectors,shape,iterations,l_rate,neigh_size)
-  test_network(vectors,shape)
-  summarize_vectors(vectors)
+# batch training: accumulate per-unit sums over the input, then set every unit to the weighted mean
+# of the patterns mapped into its neighborhood, one update per epoch
+
+def iterate_chunks(data,chunk_size=1000):
+  # data is an array (np.load(..., mmap_mode='r') or np.memmap stay on disk), a callable that
+  # returns a fresh iterable of patterns each epoch, or any re-iterable sequence of patterns. A generator
+  # or other one-shot iterator would be used up by the first epoch, so it is refused
+  if not callable(data) and not hasattr(data,'shape') and iter(data) is data:
+    raise TypeError('data is a one-shot iterator, pass a callable that returns a fresh iterable each epoch')
+  if hasattr(data,'shape'):
+    for start in xrange(0,len(data),chunk_size):
+      yield np.asarray(data[start:start+chunk_size],dtype=float)
+    return
+  chunk = []
+  for pattern in (data() if callable(data) else data):
+    chunk.append(pattern)
+    if len(chunk)==chunk_size:
+      yield np.array(chunk,dtype=float)
+      chunk = []
+  if chunk: yield np.array(chunk,dtype=float)
+
+def get_best_matching_units(vectors,patterns):
+  # |p-c|^2 = |p|^2 - 2p.c + |c|^2, |p|^2 is the same for every unit so it is left out of the argmin
+  dists = np.sum(vectors**2.0,axis=1) - 2.0*patterns.dot(vectors.T)
+  return np.argmin(dists,axis=1)
+
+def accumulate_chunk(vectors,chunk,sums,counts):
+  bmus = get_best_matching_units(vectors,chunk)
+  counts += np.bincount(bmus,minlength=len(vectors))
+  for k in xrange(chunk.shape[1]):
+    sums[:,k] += np.bincount(bmus,weights=chunk[:,k],minlength=len(vectors))
+
+def spread_to_neighborhood(som,sums,counts,neigh_size):
+  w,h = som['width'],som['height']
+  numerator,denominator = np.zeros((w,h,sums.shape[1])),np.zeros((w,h))
+  r = int(neigh_size)
+  width = max(neigh_size,1.0) # below one grid step only the unit itself is in reach, and a 0 width is 0/0
+  for unit in np.flatnonzero(counts):
+    x,y = divmod(unit,h)
+    x0,x1,y0,y1 = max(0,x-r),min(w,x+r+1),max(0,y-r),min(h,y+r+1)
+    dist = som['grid'][w-1-x+x0:w-1-x+x1, h-1-y+y0:h-1-y+y1]
+    # gaussian weighting (sigma of half the radius) keeps units apart when one neighborhood covers the map
+    weight = np.exp(-dist**2.0 / (0.5*width**2.0)) * (dist<=neigh_size)
+    numerator[x0:x1,y0:y1] += weight[:,:,np.newaxis] * sums[unit]
+    denominator[x0:x1,y0:y1] += weight * counts[unit]
+  return numerator.reshape(w*h,-1),denominator.ravel()
+
+def train_batch(som,data,epochs,neighborhood_size,chunk_size=1000,reporter=None,checkpoint=None):
+  reporter = reporter or Reporter()
+  checkpoint = make_checkpoint(checkpoint,('som.train_batch',{'width':som['width'],'height':som['height'],
+    'neighborhood_size':neighborhood_size}))
+  vectors = som['vectors']
+  state = checkpoint and checkpoint.load()
+  if state: vectors[:] = state['vectors']
+  for epoch in xrange(state['epoch']+1 if state else 0,epochs):
+    neigh_size = neighborhood_size * (1.0-(float(epoch)/float(epochs)))
+    sums,counts = np.zeros(vectors.shape),np.zeros(len(vectors))
+    for chunk in iterate_chunks(data,chunk_size):
+      accumulate_chunk(vectors,chunk,sums,counts)
+    numerator,denominator = spread_to_neighborhood(som,sums,counts,neigh_size)
+    updated = denominator>0
+    vectors[updated] = numerator[updated] / denominator[updated,np.newaxis]
+    reporter.report("epoch",">epoch={epoch}, neighborhood={neighborhood}, patterns={patterns}, units_updated={updated}",
+      epoch=epoch,neighborhood=neigh_size,patterns=int(counts.sum()),updated=np.count_nonzero(updated))
+    if checkpoint and checkpoint.due(epoch): checkpoint.save({'epoch':epoch,'vectors':vectors})
+
+def quantization_error(som,data,chunk_size=1000):
+  # mean distance from each pattern to its best matching unit
+  vectors,total,count = som['vectors'],0.0,0
+  for chunk in iterate_chunks(data,chunk_size):
+    bmus = get_best_matching_units(vectors,chunk)
+    total += np.sum(np.sqrt(np.sum((chunk-vectors[bmus])**2.0,axis=1)))
+    count += len(chunk)
+  if count==0: raise ValueError('no patterns to measure the quantization error on')
+  return total/float(count)
+
+# inference index: the trained map is cut into square tiles of neighboring units, a query ranks the
+# tile centroids and then searches only the units of the closest tiles (coarse-to-fine on the topology)
+
+def build_index(som,tile_size=None):
+  w,h = som['width'],som['height']
+  tile_size = tile_size or max(1,int(round(math.sqrt(math.sqrt(w*h))))) # about sqrt(units) units per tile
+  tiles_y = int(math.ceil(h/float(tile_size)))
+  tile_of = (som['coords'][:,0]//tile_size)*tiles_y + som['coords'][:,1]//tile_size
+  groups = [np.flatnonzero(tile_of==t) for t in np.unique(tile_of)]
+  members = np.empty((len(groups),max(len(g) for g in groups)),dtype=int)
+  for t,group in enumerate(groups):
+    members[t] = np.resize(group,members.shape[1]) # pad short edge tiles by repeating their units
+  centroids = np.array([som['vectors'][group].mean(axis=0) for group in groups])
+  return {'vectors':som['vectors'], 'members':members, 'centroids':centroids}
+
+def query_index(index,patterns,probes=4,chunk_size=256):
+  # returns the best matching unit and its distance for every pattern, probes=len(index['centroids']) is exact
+  patterns = np.atleast_2d(np.asarray(patterns,dtype=float))
+  probes = min(probes,len(index['centroids']))
+  bmus,dists = np.empty(len(patterns),dtype=int),np.empty(len(patterns))
+  for start in xrange(0,len(patterns),chunk_size):
+    chunk = patterns[start:start+chunk_size]
+    tiles = get_best_matching_units(index['centroids'],chunk) if probes==1 else \
+      np.argpartition(np.sum(index['centroids']**2.0,axis=1) - 2.0*chunk.dot(index['centroids'].T),probes-1,axis=1)[:,:probes]
+    candidates = index['members'][tiles].reshape(len(chunk),-1)
+    d2 = np.sum((index['vectors'][candidates]-chunk[:,np.newaxis,:])**2.0,axis=2)
+    best = np.argmin(d2,axis=1)
+    rows = np.arange(len(chunk))
+    bmus[start:start+len(chunk)] = candidates[rows,best]
+    dists[start:start+len(chunk)] = np.sqrt(d2[rows,best])
+  return bmus,dists
+
+def index_quantization_error(index,patterns,probes=4):
+  return float(np.mean(query_index(index,patterns,probes)[1]))
+
+def execute_batch(domain,data,epochs=10,neigh_size=5,width=4,height=5,chunk_size=1000,rng=None,reporter=None,checkpoint=None):
+  rng = make_rng(rng)
+  reporter = reporter or Reporter()
+  if np is None: raise ImportError('batch training requires numpy')
+  som = initialize_codebook(domain,width,height,numpy_rng(rng))
+  summarize_codebook(som,reporter)
+  train_batch(som,data,epochs,neigh_size,chunk_size,reporter,checkpoint)
+  reporter.summary("test","Finished, average error={error}",error=lambda: quantization_error(som,data,chunk_size))
+  summarize_codebook(som,reporter)
+  return som
+
+def execute_array(domain,shape,iterations,l_rate,neigh_size,width,height,rng=None,reporter=None,checkpoint=None):
+  rng = make_rng(rng)
+  reporter = reporter or Reporter()
+  if np is None: raise ImportError('the array engine requires numpy')
+  som = initialize_codebook(domain,width,height,rng)
+  summarize_codebook(som,reporter)
+  train_codebook(som,shape,iterations,l_rate,neigh_size,rng,reporter,checkpoint)
+  test_codebook(som,shape,rng=rng,reporter=reporter)
+  summarize_codebook(som,reporter)
+  return som
+
+def execute(domain,shape,iterations=100,l_rate=0.3,neigh_size=5,width=4,height=5,engine='dict',rng=None,reporter=None,checkpoint=None):
+  rng = make_rng(rng)
+  reporter = reporter or Reporter()
+  if engine=='array': return execute_array(domain,shape,iterations,l_rate,neigh_size,width,height,rng,reporter,checkpoint)
+  vectors = initialize_vectors(domain,width,height,rng)
+  summarize_vectors(vectors,reporter)
+  train_network(vectors,shape,iterations,l_rate,neigh_size,rng,reporter,checkpoint)
+  test_network(vectors,shape,rng=rng,reporter=reporter)
+  summarize_vectors(vectors,reporter)
   return vectors
 
 if __name__ == '__main__':
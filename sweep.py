@@ -0,0 +1,165 @@
+# Parameter Sweeps over the algorithms in the Python Programming Language
+
+# Runs one search/execute entry point over many configurations and seeds on a bounded process pool and
+# writes one JSON record per run as soon as it finishes. A configuration is a dict of keyword arguments
+# added to the fixed ones, each run also gets rng=seed. Runs print nothing, their progress records go to
+# the sweep instead: with prune=True a configuration is cancelled as soon as, at the same progress step,
+# every run of another configuration is better than every run of it (both having at least min_runs runs
+# there), its running runs stop at their next progress record and its queued runs are skipped.
+#   configs = grid({'pop_size':[50,100,200], 'p_crossover':[0.9,0.98]})
+#   sweep('genetic_algorithm.search', configs, fixed={'max_gens':100,'num_bits':64,'p_mutation':1/64.0},
+#     seeds=10, processes=4, output='runs.jsonl', objective='fitness', prune=True)
+#   python sweep.py genetic_algorithm.search --fixed max_gens=100 num_bits=64 p_mutation=0.015625 \
+#     --grid pop_size=50,100,200 p_crossover=0.9,0.98 --seeds 10 --output runs.jsonl --prune
+# The objective is read from the returned dict (fitness, cost) or else from the last progress or summary
+# record holding it (error, correct). Entry points that start processes of their own (island_search)
+# cannot run inside the pool's daemon workers and are recorded as errors.
+# This work is licensed under a Creative Commons Attribution-Noncommercial-Share License.
+
+import sys,json,time,random,itertools,importlib,multiprocessing,argparse
+from random_streams import make_rng
+from reporting import Reporter
+
+PROGRESS_EVENTS = ('generation','iteration','epoch') # reporter.report events, summaries are not progress
+
+class Cancelled(Exception):
+  pass
+
+def grid(spec):
+  # every combination of the listed values, spec is {name:[values]}
+  names = sorted(spec)
+  return [dict(zip(names,values)) for values in itertools.product(*[spec[name] for name in names])]
+
+def sample(spec,count,rng=None):
+  # count random configurations: a list is a choice, a (low,high) tuple a uniform range, ints if both are
+  rng = make_rng(rng)
+  def draw(values):
+    if isinstance(values,list): return rng.choice(values)
+    low,high = values
+    if isinstance(low,(int,long)) and isinstance(high,(int,long)): return rng.randint(low,high)
+    return rng.uniform(low,high)
+  return [dict((name,draw(spec[name])) for name in sorted(spec)) for _ in xrange(count)]
+
+def objective_value(result,record,objective):
+  if isinstance(result,dict) and objective in result: return float(result[objective])
+  return None if record is None else float(record[objective])
+
+def run_task(task,progress,cancelled):
+  # runs in a pool worker, every message including the final record goes back through progress
+  record = dict((key,task[key]) for key in ('run','config','seed','params'))
+  if task['config'] in cancelled:
+    progress.put(('finished',dict(record,status='cancelled',steps=0,seconds=0.0,objective=None)))
+    return
+  last, steps = [None], [0]
+  def sink(fields):
+    if task['objective'] in fields:
+      last[0] = fields
+      if fields['event'] in PROGRESS_EVENTS:
+        progress.put(('progress',task['config'],steps[0],float(fields[task['objective']])))
+        steps[0] += 1
+    if task['prune'] and task['config'] in cancelled: raise Cancelled()
+  module,name = task['target'].rsplit('.',1)
+  function = getattr(importlib.import_module(module),name)
+  arguments = dict(task['fixed'],**task['params'])
+  start = time.time()
+  try:
+    result = function(rng=task['seed'],reporter=Reporter(every=task['every'],sink=sink),**arguments)
+    record.update(status='done',objective=objective_value(result,last[0],task['objective']))
+  except Cancelled:
+    record.update(status='cancelled',objective=objective_value(None,last[0],task['objective']))
+  except Exception as e:
+    record.update(status='error',error=repr(e),objective=None)
+  record.update(steps=steps[0],seconds=time.time()-start)
+  progress.put(('finished',record))
+
+def dominated(values,minimize,min_runs,margin):
+  # the configurations at one progress step whose every run is worse than every run of another one
+  ready = dict((config,runs) for config,runs in values.items() if len(runs)>=min_runs)
+  if minimize:
+    best = min(max(runs) for runs in ready.values()) if ready else None
+    return [config for config,runs in ready.items() if min(runs)>best+margin]
+  best = max(min(runs) for runs in ready.values()) if ready else None
+  return [config for config,runs in ready.items() if max(runs)<best-margin]
+
+def sweep(target,configs,fixed=None,seeds=1,seed=1,processes=None,output=None,objective='fitness',minimize=False,
+    every=1,prune=False,min_runs=2,prune_after=5,margin=0.0):
+  # target is 'module.function'; runs go seed by seed across the configurations so that every
+  # configuration has early runs to compare. Returns the records in the order the runs finished
+  fixed = fixed or {}
+  min_runs = min(min_runs,seeds)
+  tasks = [{'run':i,'config':config,'seed':seed+repeat,'params':configs[config],'fixed':fixed,'target':target,
+    'objective':objective,'every':every,'prune':prune} for i,(repeat,config) in
+    enumerate(itertools.product(xrange(seeds),xrange(len(configs))))]
+  stream = open(output,'w') if isinstance(output,basestring) else output
+  manager = multiprocessing.Manager()
+  progress, cancelled = manager.Queue(), manager.dict()
+  pool = multiprocessing.Pool(processes)
+  try:
+    for task in tasks: pool.apply_async(run_task,(task,progress,cancelled))
+    curves, records = {}, []
+    while len(records)<len(tasks):
+      message = progress.get()
+      if message[0]=='finished':
+        record = dict(message[1],target=target)
+        records.append(record)
+        if stream is not None:
+          stream.write(json.dumps(record,sort_keys=True)+"\n")
+          stream.flush()
+        continue
+      _,config,step,value = message
+      if not prune or config in cancelled or step<prune_after: continue
+      values = curves.setdefault(step,{})
+      values.setdefault(config,[]).append(value)
+      for loser in dominated(dict((c,v) for c,v in values.items() if c not in cancelled),minimize,min_runs,margin):
+        cancelled[loser] = step
+  finally:
+    pool.close()
+    pool.join()
+    manager.shutdown()
+    if stream is not None and stream is not output: stream.close()
+  return records
+
+def parse_value(text):
+  try:
+    return json.loads(text)
+  except ValueError:
+    return text
+
+def parse_assignments(items,split=False):
+  # name=value, or name=v1,v2 as a list with split, or name=low:high as a (low,high) range
+  spec = {}
+  for item in items or []:
+    name,text = item.split('=',1)
+    if split and ':' in text:
+      spec[name] = tuple(parse_value(part) for part in text.split(':',1))
+    elif split:
+      spec[name] = [parse_value(part) for part in text.split(',')]
+    else:
+      spec[name] = parse_value(text)
+  return spec
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='run a search/execute entry point over a parameter sweep')
+  parser.add_argument('target',help='entry point as module.function, e.g. genetic_algorithm.search')
+  parser.add_argument('--fixed',nargs='+',help='name=value arguments passed to every run')
+  parser.add_argument('--grid',nargs='+',help='name=v1,v2,... every combination is run')
+  parser.add_argument('--random',type=int,help='this many random configurations from --grid, name=low:high is a range')
+  parser.add_argument('--seeds',type=int,default=1,help='runs per configuration, each with the next seed')
+  parser.add_argument('--seed',type=int,default=1)
+  parser.add_argument('--processes',type=int,help='concurrent runs (default one per core)')
+  parser.add_argument('--output',help='file for the JSON records, one per line (default stdout)')
+  parser.add_argument('--objective',default='fitness')
+  parser.add_argument('--minimize',action='store_true')
+  parser.add_argument('--every',type=int,default=1,help='progress records kept per run, every Nth')
+  parser.add_argument('--prune',action='store_true',help='cancel dominated configurations')
+  parser.add_argument('--min-runs',type=int,default=2)
+  parser.add_argument('--prune-after',type=int,default=5)
+  parser.add_argument('--margin',type=float,default=0.0)
+  args = parser.parse_args()
+  spec = parse_assignments(args.grid,split=True)
+  if args.random:
+    configs = sample(spec,args.random,random.Random(args.seed))
+  else:
+    configs = grid(dict((name,list(values)) for name,values in spec.items()))
+  sweep(args.target,configs,parse_assignments(args.fixed),args.seeds,args.seed,args.processes,args.output or sys.stdout,
+    args.objective,args.minimize,args.every,args.prune,args.min_runs,args.prune_after,args.margin)
@@ -0,0 +1,46 @@
+# Tests for the backpropagation engines
+
+import unittest,random
+try:
+  import numpy as np
+except ImportError:
+  np = None
+import backpropagation as bp
+from reporting import Reporter,SILENT
+from dataset import Dataset
+
+XOR = [[0,0,0], [0,1,1], [1,0,1], [1,1,0]]
+
+def dict_network(num_inputs,num_hidden,rng):
+  network = [[bp.create_neuron(num_inputs,rng) for _ in xrange(num_hidden)]]
+  network.append([bp.create_neuron(num_hidden,rng)])
+  return network
+
+def to_matrix(network):
+  # the matrix engine layout of the same weights, bias in the last column
+  return [{'weights':np.array([n['weights'] for n in layer]),'last_delta':np.zeros((len(layer),len(layer[0]['weights']))),
+    'deriv':np.zeros((len(layer),len(layer[0]['weights'])))} for layer in network]
+
+@unittest.skipIf(np is None,'the matrix engine requires numpy')
+class MatrixEngineTest(unittest.TestCase):
+  def test_full_batch_matches_dict_engine(self):
+    network = dict_network(2,4,random.Random(1))
+    matrix = to_matrix(network)
+    dict_records,matrix_records = [],[]
+    bp.train_network(network,XOR,2,500,0.3,Reporter(sink=dict_records.append))
+    bp.train_matrix_network(matrix,Dataset.from_domain(XOR,2),500,0.3,reporter=Reporter(sink=matrix_records.append))
+    self.assertEqual([r['correct'] for r in dict_records],[r['correct'] for r in matrix_records])
+    for layer,weights in zip(network,matrix):
+      np.testing.assert_allclose([n['weights'] for n in layer],weights['weights'],rtol=1e-9,atol=1e-12)
+    outputs = bp.forward_propagate_batch(matrix,np.array(XOR,dtype=float)[:,:2])[-1][:,0]
+    np.testing.assert_allclose(outputs,[bp.forward_propagate(network,map(float,p[:2])) for p in XOR],rtol=1e-9)
+    self.assertEqual(bp.test_network(network,XOR,2,SILENT),bp.test_matrix_network(matrix,Dataset.from_domain(XOR,2),SILENT))
+
+  def test_mini_batches_are_seeded(self):
+    domain = [[a,b,c,int(a+b+c>1)] for a in (0,1) for b in (0,1) for c in (0,1)]
+    first = bp.execute(domain,3,iterations=50,engine='matrix',batch_size=3,rng=5,reporter=SILENT)
+    second = bp.execute(domain,3,iterations=50,engine='matrix',batch_size=3,rng=5,reporter=SILENT)
+    for a,b in zip(first,second): np.testing.assert_array_equal(a['weights'],b['weights'])
+
+if __name__ == '__main__':
+  unittest.main()
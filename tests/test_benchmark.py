@@ -0,0 +1,34 @@
+# Tests for the benchmark harness
+# Run from the repository root with: python -m unittest discover -s tests -t .
+
+import unittest,random
+import benchmark,genetic_algorithm
+
+class CountCallsTest(unittest.TestCase):
+  def test_counts_and_restores(self):
+    original = genetic_algorithm.fitness
+    with benchmark.count_calls(genetic_algorithm,'fitness') as calls:
+      genetic_algorithm.fitness('0110')
+      genetic_algorithm.fitness('1')
+    self.assertEqual(calls[0],2)
+    self.assertIs(genetic_algorithm.fitness,original)
+
+class RunnerTest(unittest.TestCase):
+  def test_ga_runner_counts_evaluations(self):
+    evaluations,reached = benchmark.run_ga(16,random.Random(1))
+    self.assertTrue(evaluations>0)
+    self.assertIn(reached,(True,False))
+
+  def test_random_domain_is_labelled(self):
+    domain = benchmark.random_domain(50,4,random.Random(1))
+    self.assertEqual(len(domain),50)
+    for row in domain:
+      self.assertEqual(row[-1],1 if sum(row[:4])>2.0 else 0)
+
+  def test_run_case_record(self):
+    record = benchmark.run_case(benchmark.run_ga_packed,16,1)
+    for key in ('seconds','evaluations','reached_target','peak_rss_kb','time_to_target'):
+      self.assertIn(key,record)
+
+if __name__ == '__main__':
+  unittest.main()
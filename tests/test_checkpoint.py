@@ -0,0 +1,100 @@
+# Tests for checkpoint and resume: a run killed and resumed ends exactly where an uninterrupted one does
+
+import unittest,os,shutil,tempfile
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from checkpoint import Checkpoint,pack_bits,unpack_bits
+import genetic_algorithm,compact_ga,grammatical_evolution,gene_expression_programming
+import backpropagation,perceptron,som
+from reporting import SILENT
+
+GE_GRAMMAR = {'S':'EXP', 'EXP':[' EXP BINARY EXP ', ' (EXP BINARY EXP) ', ' VAR '],
+  'BINARY':['+', '-', '/', '*' ], 'VAR':['INPUT', '1.0']}
+GEP_GRAMMAR = {'FUNC':['+','-','*','/'], 'TERM':['x']}
+XOR = [[0,0,0], [0,1,1], [1,0,1], [1,1,0]]
+
+class Killed(Exception):
+  pass
+
+class KilledCheckpoint(Checkpoint):
+  # stops the run by raising right after its nth save, as if the process had been killed there
+  def __init__(self,path,every,after):
+    Checkpoint.__init__(self,path,every)
+    self.after, self.saves = after, 0
+
+  def save(self,state,rng=None):
+    Checkpoint.save(self,state,rng)
+    self.saves += 1
+    if self.saves==self.after: raise Killed()
+
+def plain(result):
+  if isinstance(result,dict): return dict((k,plain(v)) for k,v in result.items() if k!='grid')
+  if isinstance(result,(list,tuple)): return [plain(v) for v in result]
+  if np is not None and isinstance(result,np.ndarray): return result.tolist()
+  if np is not None and isinstance(result,np.generic): return result.item()
+  return result
+
+RUNS = [
+  ('ga', lambda c: genetic_algorithm.search(20,64,20,0.98,1.0/64,rng=3,reporter=SILENT,checkpoint=c)),
+  ('ga packed', lambda c: genetic_algorithm.search(20,64,20,0.98,1.0/64,packed=True,rng=3,reporter=SILENT,checkpoint=c)),
+  ('cga', lambda c: compact_ga.search(64,40,20,rng=3,reporter=SILENT,checkpoint=c)),
+  ('ge', lambda c: grammatical_evolution.search(10,20,4,40,0.3,GE_GRAMMAR,7,[1,10],rng=3,reporter=SILENT,checkpoint=c)),
+  ('ge batch', lambda c: grammatical_evolution.search(10,20,4,40,0.3,GE_GRAMMAR,7,[1,10],batch=True,rng=3,reporter=SILENT,checkpoint=c)),
+  ('gep', lambda c: gene_expression_programming.search(GEP_GRAMMAR,[1,10],5,20,10,20,0.85,rng=3,reporter=SILENT,checkpoint=c)),
+  ('backpropagation', lambda c: backpropagation.execute(XOR,2,iterations=20,rng=3,reporter=SILENT,checkpoint=c)),
+  ('perceptron', lambda c: perceptron.execute(XOR,2,20,0.1,rng=3,reporter=SILENT,checkpoint=c)),
+  ('som', lambda c: som.execute([[0.0,1.0]]*2,[[0.3,0.6]]*2,iterations=20,rng=3,reporter=SILENT,checkpoint=c)),
+]
+NUMPY_RUNS = [
+  ('ga array', lambda c: genetic_algorithm.search(20,64,20,0.98,1.0/64,vectorized=True,rng=3,reporter=SILENT,checkpoint=c)),
+  ('cga array', lambda c: compact_ga.search(64,40,20,vectorized=True,rng=3,reporter=SILENT,checkpoint=c)),
+  ('gep array', lambda c: gene_expression_programming.search(GEP_GRAMMAR,[1,10],5,20,10,20,0.85,vectorized=True,rng=3,reporter=SILENT,checkpoint=c)),
+  ('backpropagation matrix', lambda c: backpropagation.execute(XOR,2,iterations=20,engine='matrix',batch_size=2,rng=3,reporter=SILENT,checkpoint=c)),
+  ('perceptron matrix', lambda c: perceptron.execute(XOR,2,20,0.1,engine='matrix',batch_size=2,shuffle=True,rng=3,reporter=SILENT,checkpoint=c)),
+  ('som array', lambda c: som.execute([[0.0,1.0]]*2,[[0.3,0.6]]*2,iterations=20,engine='array',rng=3,reporter=SILENT,checkpoint=c)),
+  ('som batch', lambda c: som.execute_batch([[0.0,1.0]]*2,np.random.RandomState(1).random_sample((50,2)),epochs=10,neigh_size=2,rng=3,reporter=SILENT,checkpoint=c)),
+]
+
+class CheckpointTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory,'run.ckpt')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def check_resume(self,runs):
+    for name,run in runs:
+      if os.path.exists(self.path): os.remove(self.path)
+      self.assertRaises(Killed,run,KilledCheckpoint(self.path,3,2))
+      self.assertTrue(os.path.exists(self.path),name)
+      self.assertEqual(plain(run(Checkpoint(self.path,every=3))),plain(run(None)),name)
+
+  def test_resumed_run_matches_uninterrupted(self):
+    self.check_resume(RUNS)
+
+  @unittest.skipIf(np is None,'requires numpy')
+  def test_resumed_array_run_matches_uninterrupted(self):
+    self.check_resume(NUMPY_RUNS)
+
+  def test_refuses_a_different_run(self):
+    genetic_algorithm.search(5,32,10,0.98,1.0/32,rng=3,reporter=SILENT,checkpoint=self.path)
+    self.assertRaises(ValueError,genetic_algorithm.search,5,32,20,0.98,1.0/32,rng=3,reporter=SILENT,checkpoint=self.path)
+    self.assertRaises(ValueError,genetic_algorithm.search,5,32,10,0.98,1.0/32,packed=True,rng=3,reporter=SILENT,checkpoint=self.path)
+    self.assertRaises(ValueError,compact_ga.search,32,5,10,rng=3,reporter=SILENT,checkpoint=self.path)
+    genetic_algorithm.search(10,32,10,0.98,1.0/32,rng=3,reporter=SILENT,checkpoint=self.path)
+
+  def test_save_is_atomic(self):
+    checkpoint = Checkpoint(self.path)
+    checkpoint.save({'gen':1})
+    self.assertEqual(checkpoint.load()['gen'],1)
+    self.assertEqual(os.listdir(self.directory),['run.ckpt'])
+
+  def test_pack_bits_round_trip(self):
+    for bits in ['','0','1','0010110','1'*70]:
+      self.assertEqual(unpack_bits(pack_bits(bits)),bits)
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,65 @@
+# Tests for the fitness evaluators and population evaluation
+
+import unittest,random
+from evaluators import SerialEvaluator,PoolEvaluator
+from fitness_cache import FitnessCache
+import grammatical_evolution as ge
+import gene_expression_programming as gep
+
+GRAMMAR = {'S':'EXP', 'EXP':[' EXP BINARY EXP ', ' (EXP BINARY EXP) ', ' VAR '],
+  'BINARY':['+', '-', '/', '*' ], 'VAR':['INPUT', '1.0']}
+GEP_GRAMMAR = {'FUNC':['+','-','*','/'], 'TERM':['x']}
+
+def noisy(item):
+  # uses the worker's global random, which PoolEvaluator seeds per chunk
+  return item+random.random()
+
+class RecordingEvaluator(SerialEvaluator):
+  def __init__(self):
+    self.items = []
+
+  def map(self,function,items):
+    self.items.extend(items)
+    return SerialEvaluator.map(self,function,items)
+
+class PoolEvaluatorTest(unittest.TestCase):
+  def test_serial_map(self):
+    self.assertEqual(SerialEvaluator().map(abs,[-1,2,-3]),[1,2,3])
+
+  def test_same_seed_and_chunking_reproduce(self):
+    items = range(40)
+    with PoolEvaluator(processes=2,chunk_size=5,seed=7) as first:
+      a = [first.map(noisy,items),first.map(noisy,items)]
+    with PoolEvaluator(processes=3,chunk_size=5,seed=7) as second:
+      b = [second.map(noisy,items),second.map(noisy,items)]
+    self.assertEqual(a,b)
+    self.assertNotEqual(a[0],a[1])
+
+class EvaluatePopulationTest(unittest.TestCase):
+  def population(self,rng):
+    pop = [{'bitstring':ge.random_bitstring(40,rng)} for _ in xrange(30)]
+    return pop+[dict(c) for c in pop[:10]] # ten duplicated genomes
+
+  def test_every_candidate_is_scored_without_cache(self):
+    pop,evaluator = self.population(random.Random(1)),RecordingEvaluator()
+    ge.evaluate_population(pop,4,GRAMMAR,7,[1,10],evaluator=evaluator,rng=random.Random(2))
+    self.assertEqual(len(evaluator.items),len(pop))
+
+  def test_cache_scores_each_distinct_program_once(self):
+    pop,evaluator = self.population(random.Random(1)),RecordingEvaluator()
+    samples = [random.Random(2).uniform(1,10) for _ in xrange(30)]
+    ge.evaluate_population(pop,4,GRAMMAR,7,[1,10],samples=samples,cache=FitnessCache(),evaluator=evaluator)
+    self.assertEqual(len(evaluator.items),len(set(c['program'] for c in pop)))
+    for c in pop: self.assertEqual(c['fitness'],ge.cost(c['program'],[1,10],samples=samples))
+
+  def test_gep_matches_cost(self):
+    rng = random.Random(3)
+    pop = [{'genome':gep.random_genome(GEP_GRAMMAR,20,21,rng)} for _ in xrange(30)]
+    samples = [rng.uniform(1,10) for _ in xrange(30)]
+    evaluator = RecordingEvaluator()
+    gep.evaluate_population(pop,GEP_GRAMMAR,[1,10],samples=samples,evaluator=evaluator)
+    self.assertEqual(len(evaluator.items),len(pop))
+    for c in pop: self.assertEqual(c['fitness'],gep.cost(c['program'],[1,10],samples=samples))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,87 @@
+# Tests for the genetic algorithm engines
+
+import unittest,random
+try:
+  import numpy as np
+except ImportError:
+  np = None
+import genetic_algorithm as ga
+from reporting import Reporter,SILENT
+from evaluators import SerialEvaluator
+
+class PackedGenomeTest(unittest.TestCase):
+  def setUp(self):
+    self.rng = random.Random(1)
+
+  def test_pack_round_trip(self):
+    for num_bits in (1,7,64,130):
+      bitstring = ga.random_bitstring(num_bits,self.rng)
+      self.assertEqual(ga.unpack(ga.pack(bitstring),num_bits),bitstring)
+
+  def test_popcount_is_onemax(self):
+    for _ in xrange(50):
+      bitstring = ga.random_bitstring(self.rng.randint(1,200),self.rng)
+      self.assertEqual(ga.fitness_packed(ga.pack(bitstring)),ga.fitness(bitstring))
+
+  def test_crossover_matches_string_crossover(self):
+    # both draw the same numbers from the stream, so the same seed gives the same child
+    for seed in xrange(200):
+      num_bits = 2+seed%70
+      p1,p2 = ga.random_bitstring(num_bits,self.rng),ga.random_bitstring(num_bits,self.rng)
+      expected = ga.crossover(p1,p2,0.7,random.Random(seed))
+      child = ga.crossover_packed(ga.pack(p1),ga.pack(p2),num_bits,0.7,random.Random(seed))
+      self.assertEqual(ga.unpack(child,num_bits),expected)
+
+  def test_mutation_extremes(self):
+    genome = ga.pack('1011001')
+    self.assertEqual(ga.point_mutation_packed(genome,7,0.0,self.rng),genome)
+    self.assertEqual(ga.unpack(ga.point_mutation_packed(genome,7,1.0,self.rng),7),'0100110')
+
+  def test_mutation_rate_and_range(self):
+    num_bits,rate,trials = 200,0.05,2000
+    flips = 0
+    for _ in xrange(trials):
+      mutated = ga.point_mutation_packed(0,num_bits,rate,self.rng)
+      self.assertTrue(mutated < 1<<num_bits)
+      flips += ga.fitness_packed(mutated)
+    self.assertAlmostEqual(flips/float(trials*num_bits),rate,delta=0.003)
+
+  def test_each_position_flips(self):
+    seen = 0
+    for _ in xrange(500): seen |= ga.point_mutation_packed(0,16,0.1,self.rng)
+    self.assertEqual(seen,(1<<16)-1)
+
+  def test_packed_search_returns_bitstring(self):
+    best = ga.search(100,32,50,0.98,1.0/32,packed=True,rng=3,reporter=SILENT)
+    self.assertEqual(len(best['bitstring']),32)
+    self.assertEqual(ga.fitness(best['bitstring']),best['fitness'])
+
+@unittest.skipIf(np is None,'requires numpy')
+class ArrayEngineTest(unittest.TestCase):
+  def test_search_returns_bitstring_and_its_fitness(self):
+    best = ga.search(30,64,40,0.98,1.0/64,vectorized=True,rng=2,reporter=SILENT)
+    self.assertEqual(len(best['bitstring']),64)
+    self.assertEqual(ga.fitness(best['bitstring']),best['fitness'])
+
+  def test_refuses_evaluator_and_observer(self):
+    self.assertRaises(ValueError,ga.search,5,16,10,0.98,1.0/16,vectorized=True,evaluator=SerialEvaluator(),reporter=SILENT)
+    self.assertRaises(ValueError,ga.search,5,16,10,0.98,1.0/16,vectorized=True,observer=lambda *args: None,reporter=SILENT)
+
+class IslandSearchTest(unittest.TestCase):
+  def run_islands(self,**options):
+    records = []
+    best = ga.island_search(60,24,20,0.98,1.0/24,rng=5,reporter=Reporter(sink=records.append),**options)
+    return best,[(r['island'],r['fitness'],r['gens']) for r in records]
+
+  def test_seeded_run_repeats(self):
+    # the optimum is found early on some islands, the rest stop as the news reaches them
+    for options in ({},{'topology':'full'},{'packed':True,'migration_interval':3}):
+      first = self.run_islands(**options)
+      self.assertEqual(first[0]['fitness'],24)
+      self.assertEqual(self.run_islands(**options),first)
+
+  def test_needs_two_islands(self):
+    self.assertRaises(ValueError,ga.island_search,5,16,10,0.98,1.0/16,num_islands=1,reporter=SILENT)
+
+if __name__ == '__main__':
+  unittest.main()
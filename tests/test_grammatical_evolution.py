@@ -0,0 +1,37 @@
+# Tests for grammatical evolution
+
+import unittest,random
+import grammatical_evolution as ge
+from reporting import SILENT
+
+GRAMMAR = {'S':'EXP', 'EXP':[' EXP BINARY EXP ', ' (EXP BINARY EXP) ', ' VAR '],
+  'BINARY':['+', '-', '/', '*' ], 'VAR':['INPUT', '1.0']}
+
+def per_bit_integers(bitstring,codon_bits):
+  # the original decoder, bit i of a codon weighs 2**i
+  ints = []
+  for off in xrange(len(bitstring)/codon_bits):
+    codon = bitstring[off*codon_bits:(off+1)*codon_bits]
+    ints.append(sum((2**i) for i in xrange(len(codon)) if codon[i]=='1'))
+  return ints
+
+class MappingTest(unittest.TestCase):
+  def setUp(self):
+    self.rng = random.Random(1)
+
+  def test_decode_matches_per_bit_sum(self):
+    for codon_bits in (1,3,4,8):
+      for _ in xrange(50):
+        bitstring = ge.random_bitstring(self.rng.randint(0,60),self.rng)
+        self.assertEqual(ge.decode_integers(bitstring,codon_bits),per_bit_integers(bitstring,codon_bits))
+
+  def test_derive_gives_complete_programs(self):
+    compiled = ge.compile_grammar(GRAMMAR)
+    for _ in xrange(200):
+      integers = ge.decode_integers(ge.random_bitstring(40,self.rng),4)
+      program = ge.derive(compiled,integers,7)
+      for symbol in ('EXP','BINARY','VAR'): self.assertNotIn(symbol,program)
+      compile(program.replace('INPUT','2.0').strip(),'<program>','eval') # well formed, raises SyntaxError otherwise
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,53 @@
+# Tests for the perceptron engines
+
+import unittest,random
+try:
+  import numpy as np
+except ImportError:
+  np = None
+import perceptron
+from reporting import Reporter,SILENT
+from dataset import Dataset
+
+OR = [[0,0,0], [0,1,1], [1,0,1], [1,1,1]]
+
+def separable(count,num_inputs,rng):
+  # random patterns labelled by a random hyperplane
+  plane = [rng.uniform(-1,1) for _ in xrange(num_inputs+1)]
+  domain = []
+  for _ in xrange(count):
+    pattern = [rng.uniform(-1,1) for _ in xrange(num_inputs)]
+    domain.append(pattern+[int(perceptron.activate(plane,pattern)>=0)])
+  return domain
+
+@unittest.skipIf(np is None,'the matrix engine requires numpy')
+class MatrixEngineTest(unittest.TestCase):
+  def test_single_pattern_batches_match_list_engine(self):
+    rng = random.Random(4)
+    for domain,num_inputs in [(OR,2),(separable(40,3,rng),3),(separable(100,5,rng),5)]:
+      weights = perceptron.initialize_weights(num_inputs,rng)
+      matrix = np.array([weights])
+      list_records,matrix_records = [],[]
+      perceptron.train_weights(weights,domain,num_inputs,30,0.1,Reporter(sink=list_records.append))
+      perceptron.train_weight_matrix(matrix,Dataset.from_domain(domain,num_inputs),30,0.1,batch_size=1,
+        reporter=Reporter(sink=matrix_records.append))
+      self.assertEqual([r['error'] for r in list_records],[r['error'] for r in matrix_records])
+      self.assertEqual(matrix[0].tolist(),weights)
+      self.assertEqual(perceptron.test_weights(weights,domain,num_inputs,SILENT),
+        perceptron.test_weight_matrix(matrix,Dataset.from_domain(domain,num_inputs),SILENT))
+
+  def test_predictions_match_get_output(self):
+    rng = random.Random(2)
+    domain = separable(50,4,rng)
+    weights = perceptron.initialize_weights(4,rng)
+    inputs = np.array(domain,dtype=float)[:,:4]
+    expected = [perceptron.get_output(weights,map(float,p[:4])) for p in domain]
+    self.assertEqual(perceptron.predict_batch(np.array([weights]),inputs).tolist(),expected)
+
+  def test_multiclass_learns_separable_classes(self):
+    domain = [[x,y,int(x>0.5)+int(y>0.5)*2] for x in (0.0,0.2,0.8,1.0) for y in (0.0,0.2,0.8,1.0)]
+    weights = perceptron.execute(domain,2,200,0.1,engine='matrix',num_classes=4,rng=1,reporter=SILENT)
+    self.assertEqual(perceptron.predict_batch(weights,np.array(domain,dtype=float)[:,:2]).tolist(),[p[2] for p in domain])
+
+if __name__ == '__main__':
+  unittest.main()
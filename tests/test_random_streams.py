@@ -0,0 +1,77 @@
+# Tests for seedable random streams: a seeded run of every entry point repeats exactly
+
+import unittest,random
+try:
+  import numpy as np
+except ImportError:
+  np = None
+from random_streams import make_rng,spawn,numpy_rng
+import genetic_algorithm,compact_ga,grammatical_evolution,gene_expression_programming
+import backpropagation,perceptron,som
+from reporting import SILENT
+
+GE_GRAMMAR = {'S':'EXP', 'EXP':[' EXP BINARY EXP ', ' (EXP BINARY EXP) ', ' VAR '],
+  'BINARY':['+', '-', '/', '*' ], 'VAR':['INPUT', '1.0']}
+GEP_GRAMMAR = {'FUNC':['+','-','*','/'], 'TERM':['x']}
+XOR = [[0,0,0], [0,1,1], [1,0,1], [1,1,0]]
+
+def plain(result):
+  # comparable form of a result: arrays become lists
+  if isinstance(result,dict): return dict((k,plain(v)) for k,v in result.items() if k!='grid')
+  if isinstance(result,list): return [plain(v) for v in result]
+  if np is not None and isinstance(result,np.ndarray): return result.tolist()
+  return result
+
+RUNS = [
+  lambda rng: genetic_algorithm.search(20,32,30,0.98,1.0/32,rng=rng,reporter=SILENT),
+  lambda rng: genetic_algorithm.search(20,32,30,0.98,1.0/32,packed=True,rng=rng,reporter=SILENT),
+  lambda rng: compact_ga.search(32,100,20,rng=rng,reporter=SILENT),
+  lambda rng: grammatical_evolution.search(5,30,4,40,0.3,GE_GRAMMAR,7,[1,10],rng=rng,reporter=SILENT),
+  lambda rng: gene_expression_programming.search(GEP_GRAMMAR,[1,10],20,21,5,30,0.85,rng=rng,reporter=SILENT),
+  lambda rng: backpropagation.execute(XOR,2,iterations=50,rng=rng,reporter=SILENT),
+  lambda rng: perceptron.execute(XOR,2,20,0.1,rng=rng,reporter=SILENT),
+  lambda rng: som.execute([[0.0,1.0]]*2,[[0.3,0.6]]*2,iterations=50,rng=rng,reporter=SILENT),
+]
+NUMPY_RUNS = [
+  lambda rng: genetic_algorithm.search(20,32,30,0.98,1.0/32,vectorized=True,rng=rng,reporter=SILENT),
+  lambda rng: compact_ga.search(32,100,20,vectorized=True,rng=rng,reporter=SILENT),
+  lambda rng: gene_expression_programming.search(GEP_GRAMMAR,[1,10],20,21,5,30,0.85,vectorized=True,rng=rng,reporter=SILENT),
+  lambda rng: backpropagation.execute(XOR,2,iterations=50,engine='matrix',batch_size=2,rng=rng,reporter=SILENT),
+  lambda rng: perceptron.execute(XOR,2,20,0.1,engine='matrix',shuffle=True,rng=rng,reporter=SILENT),
+  lambda rng: som.execute([[0.0,1.0]]*2,[[0.3,0.6]]*2,iterations=50,engine='array',rng=rng,reporter=SILENT),
+]
+
+class StreamTest(unittest.TestCase):
+  def test_make_rng(self):
+    self.assertIs(make_rng(None),random)
+    self.assertEqual(make_rng(4).random(),random.Random(4).random())
+    stream = random.Random(1)
+    self.assertIs(make_rng(stream),stream)
+
+  def test_spawn_is_seeded_and_independent(self):
+    first,second = spawn(3,2),spawn(3,2)
+    self.assertEqual([s.random() for s in first],[s.random() for s in second])
+    a,b = spawn(3,2)
+    self.assertNotEqual(a.random(),b.random())
+
+  @unittest.skipIf(np is None,'requires numpy')
+  def test_numpy_rng_derives_from_stream(self):
+    self.assertEqual(numpy_rng(5).random_sample(),numpy_rng(5).random_sample())
+    state = np.random.RandomState(1)
+    self.assertIs(numpy_rng(state),state)
+
+class SeededRunTest(unittest.TestCase):
+  def check(self,runs):
+    for run in runs:
+      self.assertEqual(plain(run(7)),plain(run(7)))
+      self.assertEqual(plain(run(random.Random(7))),plain(run(7)))
+
+  def test_entry_points_repeat(self):
+    self.check(RUNS)
+
+  @unittest.skipIf(np is None,'requires numpy')
+  def test_numpy_engines_repeat(self):
+    self.check(NUMPY_RUNS)
+
+if __name__ == '__main__':
+  unittest.main()
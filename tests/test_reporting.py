@@ -0,0 +1,76 @@
+# Tests for progress reporting: the default reporter prints exactly what the loops used to print
+
+import unittest,sys,random
+from StringIO import StringIO
+from reporting import Reporter,SILENT
+import genetic_algorithm,compact_ga,grammatical_evolution,gene_expression_programming
+import backpropagation,perceptron,som
+
+GE_GRAMMAR = {'S':'EXP', 'EXP':[' EXP BINARY EXP ', ' (EXP BINARY EXP) ', ' VAR '],
+  'BINARY':['+', '-', '/', '*' ], 'VAR':['INPUT', '1.0']}
+GEP_GRAMMAR = {'FUNC':['+','-','*','/'], 'TERM':['x']}
+XOR = [[0,0,0], [0,1,1], [1,0,1], [1,1,0]]
+
+# the print statements of each loop before it reported through a Reporter, by event
+PRINTED = {
+  'genetic_algorithm': {'generation': lambda r: ">%d: %d, %s" % (r['gen'],r['fitness'],r['bitstring'])},
+  'compact_ga': {'iteration': lambda r: ">iter=%d, f=%d, s=%s" % (r['iter'],r['cost'],r['bitstring'])},
+  'grammatical_evolution': {'generation': lambda r: ' > gen=%d, f=%f\n s=%s' % (r['gen'],r['fitness'],r['program'])},
+  'gene_expression_programming': {'generation':
+    lambda r: " > gen={0}, f={1}, g={2} p={3}".format(r['gen'],r['fitness'],r['genome'],r['program'])},
+  'backpropagation': {'epoch': lambda r: "> epoch={0}, Correct={1}/{2}".format(r['epoch'],r['correct'],r['total']),
+    'test': lambda r: "Finished test with a score of {0}/{1}".format(r['correct'],r['total']),
+    'topology': lambda r: "Topology: {0} {1}".format(r['inputs'],r['layers'])},
+  'perceptron': {'epoch': lambda r: "> epoch={0}, error={1}".format(r['epoch'],r['error']),
+    'test': lambda r: "Finished test with a score of {0}/{1}".format(r['correct'],r['total'])},
+  'som': {'iteration': lambda r: ">training: neighbors={0}, bmu_dist={1}".format(r['neighbors'],r['dist']),
+    'vectors': lambda r: "Vector details: {0}".format(r['details']),
+    'test': lambda r: "Finished, average error={0}".format(r['error'])},
+}
+
+RUNS = {
+  'genetic_algorithm': lambda reporter: genetic_algorithm.search(20,32,10,0.98,1.0/32,rng=3,reporter=reporter),
+  'compact_ga': lambda reporter: compact_ga.search(32,20,20,rng=3,reporter=reporter),
+  'grammatical_evolution': lambda reporter: grammatical_evolution.search(3,20,4,40,0.3,GE_GRAMMAR,7,[1,10],rng=3,reporter=reporter),
+  'gene_expression_programming': lambda reporter: gene_expression_programming.search(GEP_GRAMMAR,[1,10],3,20,5,30,0.85,rng=3,reporter=reporter),
+  'backpropagation': lambda reporter: backpropagation.execute(XOR,2,iterations=20,rng=3,reporter=reporter),
+  'perceptron': lambda reporter: perceptron.execute(XOR,2,10,0.1,rng=3,reporter=reporter),
+  'som': lambda reporter: som.execute([[0.0,1.0]]*2,[[0.3,0.6]]*2,iterations=20,rng=3,reporter=reporter),
+}
+
+def printed(run,reporter=None):
+  stdout, sys.stdout = sys.stdout, StringIO()
+  try:
+    run(reporter)
+    return sys.stdout.getvalue()
+  finally:
+    sys.stdout = stdout
+
+class ReporterTest(unittest.TestCase):
+  def test_default_output_is_unchanged(self):
+    for name,run in sorted(RUNS.items()):
+      records = []
+      run(Reporter(sink=records.append))
+      expected = ''.join(PRINTED[name][r['event']](r)+'\n' for r in records)
+      self.assertTrue(records,name)
+      self.assertEqual(printed(run),expected,name)
+
+  def test_every_keeps_every_nth_progress_line(self):
+    records = []
+    reporter = Reporter(every=3,sink=records.append)
+    for i in xrange(10): reporter.report('iteration','{i}',i=i)
+    reporter.summary('test','done')
+    self.assertEqual([r.get('i') for r in records],[0,3,6,9,None])
+
+  def test_silent_prints_nothing(self):
+    for name,run in sorted(RUNS.items()):
+      self.assertEqual(printed(run,SILENT),'',name)
+
+  def test_fields_are_only_computed_when_emitted(self):
+    calls = []
+    reporter = Reporter(every=2,sink=lambda fields: None)
+    for i in xrange(4): reporter.report('iteration','{x}',x=lambda: calls.append(i))
+    self.assertEqual(calls,[0,2])
+
+if __name__ == '__main__':
+  unittest.main()
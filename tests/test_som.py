@@ -0,0 +1,89 @@
+# Tests for the self-organizing map engines
+
+import unittest,random
+try:
+  import numpy as np
+except ImportError:
+  np = None
+import som
+from reporting import Reporter,SILENT
+
+DOMAIN = [[0.0,1.0],[0.0,1.0]]
+SHAPE = [[0.3,0.6],[0.3,0.6]]
+
+@unittest.skipIf(np is None,'the array engine requires numpy')
+class ArrayEngineTest(unittest.TestCase):
+  def test_same_stream_gives_same_codebook(self):
+    dict_records,array_records = [],[]
+    vectors = som.execute(DOMAIN,SHAPE,iterations=200,width=4,height=5,rng=3,reporter=Reporter(sink=dict_records.append))
+    codebook = som.execute(DOMAIN,SHAPE,iterations=200,width=4,height=5,engine='array',rng=3,reporter=Reporter(sink=array_records.append))
+    np.testing.assert_array_equal(codebook['vectors'],[c['vector'] for c in vectors])
+    np.testing.assert_array_equal(codebook['coords'],[c['coord'] for c in vectors])
+    self.assertEqual([r.get('neighbors') for r in dict_records],[r.get('neighbors') for r in array_records])
+
+  def test_best_matching_unit_matches(self):
+    rng = random.Random(1)
+    vectors = som.initialize_vectors(DOMAIN*3,6,7,rng)
+    codebook = np.array([c['vector'] for c in vectors])
+    for _ in xrange(200):
+      pattern = som.random_vector(DOMAIN*3,rng)
+      bmu,dist = som.get_best_matching_unit(vectors,pattern)
+      index,index_dist = som.get_best_matching_unit_index(codebook,np.array(pattern))
+      self.assertIs(vectors[index],bmu)
+      self.assertAlmostEqual(index_dist,dist,places=12)
+
+  def test_grid_distances_match_coordinates(self):
+    codebook = som.initialize_codebook(DOMAIN,5,3,random.Random(1))
+    for unit in xrange(15):
+      expected = [som.euclidean_distance(codebook['coords'][unit],other) for other in codebook['coords']]
+      np.testing.assert_allclose(som.get_grid_distances(codebook,unit),expected)
+
+@unittest.skipIf(np is None,'batch training requires numpy')
+class BatchTrainingTest(unittest.TestCase):
+  def setUp(self):
+    self.data = np.random.RandomState(1).uniform(0.3,0.6,(500,2))
+
+  def train(self,data,neighborhood_size=2):
+    codebook = som.initialize_codebook(DOMAIN,4,5,np.random.RandomState(2))
+    som.train_batch(codebook,data,5,neighborhood_size,chunk_size=64,reporter=SILENT)
+    return codebook
+
+  def test_callable_and_sequence_match_array(self):
+    expected = self.train(self.data)['vectors']
+    rows = self.data.tolist()
+    np.testing.assert_allclose(self.train(lambda: iter(rows))['vectors'],expected)
+    np.testing.assert_allclose(self.train(rows)['vectors'],expected)
+
+  def test_one_shot_iterator_is_refused(self):
+    with self.assertRaises(TypeError):
+      self.train(row for row in self.data.tolist())
+
+  def test_empty_input_has_no_quantization_error(self):
+    with self.assertRaises(ValueError):
+      som.quantization_error(self.train(self.data),np.empty((0,2)))
+
+  def test_zero_neighborhood_moves_winners_to_their_mean(self):
+    codebook = som.initialize_codebook(DOMAIN,4,5,np.random.RandomState(2))
+    bmus = som.get_best_matching_units(codebook['vectors'],self.data)
+    som.train_batch(codebook,self.data,1,0,reporter=SILENT)
+    for unit in np.unique(bmus):
+      np.testing.assert_allclose(codebook['vectors'][unit],self.data[bmus==unit].mean(axis=0))
+
+@unittest.skipIf(np is None,'the index requires numpy')
+class IndexTest(unittest.TestCase):
+  def test_probing_every_tile_is_exact(self):
+    codebook = som.initialize_codebook([[0.0,1.0]]*8,9,7,np.random.RandomState(1))
+    patterns = np.random.RandomState(2).uniform(0,1,(300,8))
+    index = som.build_index(codebook,tile_size=3)
+    bmus,dists = som.query_index(index,patterns,probes=len(index['centroids']),chunk_size=64)
+    expected = som.get_best_matching_units(codebook['vectors'],patterns)
+    np.testing.assert_array_equal(bmus,expected)
+    np.testing.assert_allclose(dists,np.sqrt(np.sum((patterns-codebook['vectors'][expected])**2.0,axis=1)))
+
+  def test_every_unit_is_in_a_tile(self):
+    codebook = som.initialize_codebook([[0.0,1.0]]*2,10,4,np.random.RandomState(1))
+    index = som.build_index(codebook)
+    self.assertEqual(set(index['members'].ravel()),set(xrange(40)))
+
+if __name__ == '__main__':
+  unittest.main()